@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Milvus 向量索引对比脚本
+
+按指定的索引类型和参数重建集合的向量索引，输出估算内存、构建耗时、recall@k 和检索耗时 p50/p99。
+recall 以本地暴力检索得到的精确 top-k 为基准，查询向量从集合中随机抽取。
+重建索引期间集合不可检索，请在迁移脚本（init/migrate_milvus_collection.py）复制出的集合上运行。
+
+用法：python -m init.benchmark_milvus_index <集合> --index-type IVF_PQ [--params '{"nlist": 2048}']
+      [--search-params '{"nprobe": 64}'] [--queries 200] [--k 10]
+"""
+import argparse
+import json
+import random
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+from loguru import logger
+from pymilvus import Collection, connections
+
+from src.config.config import settings
+from src.db_conn.milvus import MilvusClientWrapper, MilvusConfig, MilvusConnector
+from src.db_conn.milvus_index import IndexConfig
+from src.utils.vector import from_storage_vector
+
+BENCHMARK_ALIAS = "benchmark"
+ELEMENT_SIZES = {"float32": 4, "float16": 2, "bfloat16": 2}
+
+
+def load_vectors(wrapper: MilvusClientWrapper, collection_name: str, max_rows: int, batch_size: int = 1000):
+    """读取集合的 id 和向量（最多 max_rows 条，转换为 float32），用于计算精确 top-k"""
+    config = wrapper.connector.config
+    storage_type = wrapper.get_storage_type(collection_name)
+    connections.connect(
+        alias=BENCHMARK_ALIAS,
+        uri=f"http://{config.host}:{config.port}",
+        db_name=config.db_name,
+        user=config.user,
+        password=config.password,
+        timeout=config.timeout,
+    )
+    try:
+        iterator = Collection(collection_name, using=BENCHMARK_ALIAS).query_iterator(
+            batch_size=batch_size, limit=max_rows, expr="id >= 0", output_fields=["id", "embedding"]
+        )
+        ids: List[int] = []
+        vectors: List[np.ndarray] = []
+        try:
+            while True:
+                rows = iterator.next()
+                if not rows:
+                    break
+                ids.extend(row["id"] for row in rows)
+                vectors.extend(from_storage_vector(row["embedding"], storage_type) for row in rows)
+        finally:
+            iterator.close()
+    finally:
+        connections.disconnect(BENCHMARK_ALIAS)
+    return np.asarray(ids), np.vstack(vectors)
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int, metric_type: str) -> np.ndarray:
+    """精确 top-k（返回行号）"""
+    if metric_type == "L2":
+        scores = -((queries ** 2).sum(axis=1, keepdims=True) - 2 * queries @ vectors.T + (vectors ** 2).sum(axis=1))
+    else:
+        scores = queries @ vectors.T
+    top = np.argpartition(-scores, min(k, scores.shape[1] - 1), axis=1)[:, :k]
+    order = np.take_along_axis(scores, top, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(top, order, axis=1)
+
+
+def run_benchmark(
+        wrapper: MilvusClientWrapper,
+        collection_name: str,
+        index_config: IndexConfig,
+        num_queries: int = 200,
+        k: int = 10,
+        max_rows: int = 200000
+) -> Dict[str, Any]:
+    metric_type = settings.SEARCH_CONFIG["metric_type"]
+    ids, vectors = load_vectors(wrapper, collection_name, max_rows)
+    logger.info(f"Loaded {len(ids)} vectors (dim={vectors.shape[1]}) from {collection_name}")
+    if len(ids) >= max_rows:
+        logger.warning(f"Only the first {max_rows} rows are used as ground truth, recall may be underestimated")
+
+    query_rows = random.sample(range(len(ids)), min(num_queries, len(ids)))
+    queries = vectors[query_rows]
+    expected = ids[exact_top_k(vectors, queries, k, metric_type)]
+
+    build_time = wrapper.rebuild_vector_index(collection_name, index_config, metric_type)
+    logger.info(f"Index {index_config.index_type} built in {build_time:.1f}s")
+
+    search_params = {"metric_type": metric_type, "params": index_config.search_params}
+    latencies = []
+    hits = 0
+    for query, expected_ids in zip(queries, expected):
+        start_time = time.perf_counter()
+        result = wrapper.search([query], search_params, limit=k, collection_name=collection_name)
+        latencies.append((time.perf_counter() - start_time) * 1000)
+        hits += len({hit["id"] for hit in result[0]} & set(expected_ids.tolist()))
+
+    return {
+        "collection": collection_name,
+        "index_type": index_config.index_type,
+        "params": index_config.params,
+        "search_params": index_config.search_params,
+        "rows": int(len(ids)),
+        "dimension": int(vectors.shape[1]),
+        "vector_type": wrapper.get_storage_type(collection_name),
+        "estimated_memory_mb": round(index_config.estimate_memory(
+            len(ids), vectors.shape[1], ELEMENT_SIZES[wrapper.get_storage_type(collection_name)]
+        ) / 1024 ** 2, 1),
+        "build_time_s": round(build_time, 2),
+        f"recall@{k}": round(hits / (len(queries) * k), 4),
+        "latency_p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "latency_p99_ms": round(float(np.percentile(latencies, 99)), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild a Milvus vector index and report recall and latency")
+    parser.add_argument("collection", help="集合名称（索引会被重建）")
+    parser.add_argument("--index-type", default=settings.MILVUS_INDEX_TYPE, help="索引类型")
+    parser.add_argument("--params", type=json.loads, default=None, help="建索引参数（JSON）")
+    parser.add_argument("--search-params", type=json.loads, default=None, help="检索参数（JSON）")
+    parser.add_argument("--queries", type=int, default=200, help="查询次数")
+    parser.add_argument("--k", type=int, default=10, help="recall@k 的 k")
+    parser.add_argument("--max-rows", type=int, default=200000, help="最多读取的数据条数（用于精确 top-k）")
+    args = parser.parse_args()
+
+    wrapper = MilvusClientWrapper(MilvusConnector(MilvusConfig()))
+    try:
+        index_config = IndexConfig.create(args.index_type, args.params, args.search_params)
+        report = run_benchmark(wrapper, args.collection, index_config, args.queries, args.k, args.max_rows)
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return 0
+    except Exception as e:
+        print(f"Index benchmark failed: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    exit(main())
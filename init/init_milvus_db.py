@@ -8,7 +8,8 @@ from loguru import logger
 from pymilvus import DataType, MilvusException
 
 from src.config.config import settings
-from src.db_conn.milvus import MilvusConnector
+from src.db_conn.milvus import MilvusConnector, vector_data_type
+from src.db_conn.milvus_index import get_binary_index_config, get_index_config
 
 
 class CollectionCreator:
@@ -18,6 +19,8 @@ class CollectionCreator:
     COLLECTION_FIELDS = [
         ("id", DataType.INT64, {"is_primary": True, "auto_id": True}),  # 改为自动生成ID
         ("embedding", DataType.FLOAT_VECTOR, {}),
+        # 二值量化向量（MILVUS_BINARY_VECTOR_ENABLED 时创建），用于两阶段检索的召回
+        ("embedding_binary", DataType.BINARY_VECTOR, {}),
         ("image_url", DataType.VARCHAR, {"max_length": 512}),
         ("image_width", DataType.INT64, {}),
         ("image_height", DataType.INT64, {}),
@@ -25,7 +28,8 @@ class CollectionCreator:
         ("file_name", DataType.VARCHAR, {"max_length": 100}),
         ("file_page", DataType.INT64, {}),
         ("file_url", DataType.VARCHAR, {"max_length": 512}),
-        ("knowledge_base_id", DataType.VARCHAR, {"max_length": 100}),
+        # 知识库id作为分区键，按知识库过滤时只检索对应分区
+        ("knowledge_base_id", DataType.VARCHAR, {"max_length": 100, "is_partition_key": True}),
     ]
 
     def __init__(self, connector: MilvusConnector):
@@ -34,9 +38,10 @@ class CollectionCreator:
     def recreate_collection(
             self,
             collection_name: str = "colqwen_v1_0",
-            dimension: int = 2048,
+            dimension: int = settings.EMBED_DIMENSION,
             metric_type: str = settings.SEARCH_CONFIG['metric_type'],
-            force_recreate: bool = True
+            force_recreate: bool = True,
+            vector_type: str = settings.MILVUS_VECTOR_TYPE
     ) -> bool:
         """
         重建集合（如果存在则先删除）
@@ -46,6 +51,7 @@ class CollectionCreator:
             dimension: 向量维度
             metric_type: 相似度度量类型 (IP/L2等)
             force_recreate: 即使集合不存在也创建
+            vector_type: 向量存储类型 (FLOAT_VECTOR/FLOAT16_VECTOR/BFLOAT16_VECTOR)
 
         Returns:
             bool: True表示创建了新集合，False表示集合已存在且未重建
@@ -73,7 +79,11 @@ class CollectionCreator:
 
             # 添加所有预定义字段
             for field_name, datatype, kwargs in self.COLLECTION_FIELDS:
+                if field_name == "embedding_binary" and not settings.MILVUS_BINARY_VECTOR_ENABLED:
+                    continue
                 if field_name == "embedding":
+                    datatype = vector_data_type(vector_type)
+                if field_name in ("embedding", "embedding_binary"):
                     kwargs["dim"] = dimension
                 schema.add_field(field_name=field_name, datatype=datatype, **kwargs)
 
@@ -81,7 +91,8 @@ class CollectionCreator:
             client.create_collection(
                 collection_name=collection_name,
                 schema=schema,
-                consistency_level="Strong"
+                consistency_level="Strong",
+                num_partitions=settings.MILVUS_NUM_PARTITIONS
             )
 
             # 创建索引
@@ -101,16 +112,30 @@ class CollectionCreator:
         """创建向量和标量索引"""
         client = self.connector.client
 
-        # 向量索引 (HNSW)
+        # 向量索引（类型和参数按集合配置）
+        index_config = get_index_config(collection_name)
         vector_index_params = client.prepare_index_params()
         vector_index_params.add_index(
             field_name="embedding",
             metric_type=metric_type,
-            index_type="HNSW",
-            params={"M": 32, "efConstruction": 200}
+            index_type=index_config.index_type,
+            params=index_config.params
         )
         client.create_index(collection_name, vector_index_params)
-        logger.info("Vector index (HNSW) created")
+        logger.info(f"Vector index ({index_config.index_type}) created")
+
+        # 二值量化向量索引 (汉明距离)
+        if settings.MILVUS_BINARY_VECTOR_ENABLED:
+            binary_index_config = get_binary_index_config()
+            binary_index_params = client.prepare_index_params()
+            binary_index_params.add_index(
+                field_name="embedding_binary",
+                metric_type="HAMMING",
+                index_type=binary_index_config.index_type,
+                params=binary_index_config.params
+            )
+            client.create_index(collection_name, binary_index_params)
+            logger.info(f"Binary vector index ({binary_index_config.index_type}) created")
 
         # 标量索引 (INVERTED)
         scalar_index_params = client.prepare_index_params()
@@ -145,7 +170,7 @@ def main():
         # 强制重建集合
         success = creator.recreate_collection(
             collection_name=settings.MILVUS_DB_COLLECTION_NAME,
-            dimension=2048,
+            dimension=settings.EMBED_DIMENSION,
             metric_type=settings.SEARCH_CONFIG['metric_type'],
             force_recreate=True
         )
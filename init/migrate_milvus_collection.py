@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Milvus 集合迁移脚本
+
+按当前的集合定义（COLLECTION_FIELDS，含知识库分区键）创建新集合，并从已有集合读取全部数据写入新集合，
+不需要重新调用向量化服务。指定 --dimension 时把向量截取前 N 维并重新归一化（降维），
+指定 --vector-type 时按新的存储精度（如 FLOAT16_VECTOR）写入；开启 MILVUS_BINARY_VECTOR_ENABLED 时新集合同时写入二值量化向量。
+迁移完成后将 MILVUS_DB_COLLECTION_NAME 改为新集合（降维时 EMBED_DIMENSION 改为新维度）即可切换。
+
+用法：python -m init.migrate_milvus_collection <源集合> <新集合> [--dimension 1024]
+      [--vector-type FLOAT16_VECTOR] [--batch-size 1000]
+"""
+import argparse
+import time
+from typing import Optional
+
+from loguru import logger
+from pymilvus import Collection, connections
+
+from init.init_milvus_db import CollectionCreator
+from src.config.config import settings
+from src.db_conn.milvus import MilvusClientWrapper, MilvusConfig, MilvusConnector
+from src.utils.vector import from_storage_vector, truncate_vector
+
+MIGRATE_ALIAS = "migrate"
+
+
+def migrate_collection(
+        connector: MilvusConnector,
+        source: str,
+        target: str,
+        dimension: Optional[int] = None,
+        batch_size: int = 1000,
+        vector_type: str = settings.MILVUS_VECTOR_TYPE
+) -> int:
+    """
+    迁移集合数据到新集合（新集合存在时会被重建），dimension 为空时保持原维度，向量按 vector_type 存储
+
+    Returns:
+        int: 迁移的数据条数
+    """
+    connector.connect()
+    client = connector.client
+    if not client.has_collection(source):
+        raise ValueError(f"Collection {source} does not exist")
+    if source == target:
+        raise ValueError("Target collection must be different from source collection")
+    wrapper = MilvusClientWrapper(connector)
+    source_dimension = wrapper.get_dimension(source)
+    source_storage_type = wrapper.get_storage_type(source)
+    dimension = dimension or source_dimension
+    if source_dimension is None or dimension > source_dimension:
+        raise ValueError(f"Dimension {dimension} must not exceed source dimension {source_dimension}")
+
+    CollectionCreator(connector).recreate_collection(
+        collection_name=target,
+        dimension=dimension,
+        metric_type=settings.SEARCH_CONFIG['metric_type'],
+        force_recreate=True,
+        vector_type=vector_type
+    )
+
+    # MilvusClient 没有迭代查询接口，使用 ORM 的 query_iterator 分批读取
+    config = connector.config
+    connections.connect(
+        alias=MIGRATE_ALIAS,
+        uri=f"http://{config.host}:{config.port}",
+        db_name=config.db_name,
+        user=config.user,
+        password=config.password,
+        timeout=config.timeout,
+    )
+    try:
+        collection = Collection(source, using=MIGRATE_ALIAS)
+        collection.load()
+        iterator = collection.query_iterator(batch_size=batch_size, expr="id >= 0", output_fields=["*"])
+
+        migrated = 0
+        start_time = time.time()
+        try:
+            while True:
+                rows = iterator.next()
+                if not rows:
+                    break
+                for row in rows:
+                    row.pop("id", None)
+                    # 二值向量在写入时按新集合的定义重新生成
+                    row.pop("embedding_binary", None)
+                    embedding = from_storage_vector(row["embedding"], source_storage_type)
+                    row["embedding"] = truncate_vector(embedding, dimension)
+                # 写入时按新集合的存储精度转换
+                wrapper.insert(rows, collection_name=target)
+                migrated += len(rows)
+                logger.info(f"Migrated {migrated} records in {time.time() - start_time:.1f}s")
+        finally:
+            iterator.close()
+    finally:
+        connections.disconnect(MIGRATE_ALIAS)
+
+    client.load_collection(target)
+    logger.success(f"Collection {source} migrated to {target} (dim={dimension}, {vector_type}), records: {migrated}")
+    return migrated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild a Milvus collection with the current schema")
+    parser.add_argument("source", help="源集合名称")
+    parser.add_argument("target", help="新集合名称（存在时会被重建）")
+    parser.add_argument("--dimension", type=int, default=None, help="新集合的向量维度，默认与源集合相同")
+    parser.add_argument("--vector-type", default=settings.MILVUS_VECTOR_TYPE, help="新集合的向量存储类型")
+    parser.add_argument("--batch-size", type=int, default=1000, help="每批读取的数据条数")
+    args = parser.parse_args()
+
+    connector = MilvusConnector(MilvusConfig())
+    try:
+        migrate_collection(
+            connector, args.source, args.target, args.dimension, args.batch_size, args.vector_type
+        )
+        return 0
+    except Exception as e:
+        print(f"Collection migration failed: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    exit(main())
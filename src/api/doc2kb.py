@@ -2,10 +2,12 @@ import asyncio
 from functools import lru_cache
 from typing import List
 
-from fastapi import APIRouter, UploadFile, File, Form, Depends
+from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
 
-from src.schemas.response import response_success, response_error
+from src.schemas.doc2kb_schemas import ResumeIngestParams
+from src.schemas.response import response_success, response_error, ResponseCode
 from src.service.doc2kb_service import PDFToImageService
+from src.service.ingest_job_service import IngestJobManager
 
 router = APIRouter()
 
@@ -22,6 +24,12 @@ def get_pdf_service():
     return PDFToImageService()
 
 
+@lru_cache
+def get_ingest_job_manager():
+    """获取异步入库任务管理器单例"""
+    return IngestJobManager(get_pdf_service())
+
+
 @router.post("/pdf2knowledge_base")
 async def pdf2knowledge_base(
         files: List[UploadFile] = File(..., description="上传文件列表"),
@@ -41,12 +49,57 @@ async def pdf2knowledge_base(
         tasks.append(task)
 
     # 并发执行所有任务
-    image_data_list = await asyncio.gather(*tasks)
+    ingest_results = await asyncio.gather(*tasks)
 
     # 组装结果
     res = [
-        {"file": file.filename, "image": image_data}
-        for file, image_data in zip(files, image_data_list)
+        {"file": file.filename, "result": ingest_result}
+        for file, ingest_result in zip(files, ingest_results)
     ]
 
     return response_success(data={"msg": "入库成功" if res else "入库失败"})
+
+
+@router.post("/pdf2knowledge_base/jobs")
+async def submit_pdf2knowledge_base_job(
+        files: List[UploadFile] = File(..., description="上传文件列表"),
+        knowledge_base_id: str = Form(..., description="知识库名字"),
+        job_manager: IngestJobManager = Depends(get_ingest_job_manager)
+):
+    """异步入库：文件落盘后立即返回任务id，通过 /doc/jobs/{job_id} 查询进度"""
+    if not files:
+        return response_error(message="请至少上传一个文件")
+
+    try:
+        job_id = await job_manager.submit(files, knowledge_base_id)
+        return response_success(data={"job_id": job_id}, code=ResponseCode.ACCEPTED.value)
+    except HTTPException as e:
+        return response_error(message=str(e.detail), code=e.status_code)
+    except Exception as e:
+        return response_error(str(e))
+
+
+@router.post("/resume")
+async def resume_pdf2knowledge_base(
+        params: ResumeIngestParams,
+        job_manager: IngestJobManager = Depends(get_ingest_job_manager)
+):
+    """续传：只处理文件中未写入和失败的页面，返回任务id"""
+    try:
+        job_id = await job_manager.submit_resume(params.file_id)
+        return response_success(data={"job_id": job_id}, code=ResponseCode.ACCEPTED.value)
+    except HTTPException as e:
+        return response_error(message=str(e.detail), code=e.status_code)
+    except Exception as e:
+        return response_error(str(e))
+
+
+@router.get("/jobs/{job_id}")
+async def get_pdf2knowledge_base_job(
+        job_id: str,
+        job_manager: IngestJobManager = Depends(get_ingest_job_manager)
+):
+    job = await job_manager.get_job(job_id)
+    if not job:
+        return response_error(message="任务不存在", code=ResponseCode.NOT_FOUND.value)
+    return response_success(data=job)
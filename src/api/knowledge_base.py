@@ -53,7 +53,9 @@ async def create_kb_data(params: CreateKnowledgeBaseParams):
     try:
         kb = await create_knowledge_base(
             knowledge_description=params.knowledge_description,
-            knowledge_name=params.knowledge_base_name
+            knowledge_name=params.knowledge_base_name,
+            image_options=params.image_options.model_dump(exclude_none=True) if params.image_options else None,
+            text_policy=params.text_policy
         )
         return response_success(data=kb.to_dict())
     except Exception as e:
@@ -66,7 +68,9 @@ async def update_kb_data(params: UpdateKnowledgeBaseParams):
         kb = await update_knowledge_base(
             params.knowledge_base_id,
             params.knowledge_description,
-            params.knowledge_base_name
+            params.knowledge_base_name,
+            params.image_options.model_dump(exclude_none=True) if params.image_options else None,
+            params.text_policy
         )
         return response_success(data=kb.to_dict())
     except Exception as e:
@@ -1,8 +1,9 @@
 from fastapi import APIRouter
 
 from src.schemas.response import response_success, response_error
-from src.schemas.retrieval_schemas import SearchDocumentImagesParams
-from src.service.retrieval_service import retrieval_image
+from src.schemas.retrieval_schemas import BatchSearchDocumentImagesParams, SearchDocumentImagesParams
+from src.service.embedding_cache import get_embedding_cache
+from src.service.retrieval_service import retrieval_image, retrieval_image_batch
 
 router = APIRouter()
 
@@ -14,3 +15,19 @@ async def search_document_images(params: SearchDocumentImagesParams):
         return response_success(data=data)
     except Exception as e:
         return response_error(str(e))
+
+
+@router.post("/doc/batch")
+async def search_document_images_batch(params: BatchSearchDocumentImagesParams):
+    """批量检索，返回结果与 queries 顺序一致"""
+    try:
+        data = await retrieval_image_batch(params)
+        return response_success(data=data)
+    except Exception as e:
+        return response_error(str(e))
+
+
+@router.get("/embedding_cache/stats")
+async def embedding_cache_stats():
+    """检索问题向量缓存命中统计"""
+    return response_success(data=get_embedding_cache().stats())
@@ -30,8 +30,10 @@ class Settings(BaseSettings):
 
     SEARCH_CONFIG: dict = {
         "metric_type": "IP",  # 使用内积相似度
-        "params": {"ef": 128},
     }
+    SEARCH_BATCH_MAX_QUERIES: int = 256  # 批量检索单次请求的最大问题数
+    SEARCH_BINARY_RESCORE: bool = False  # 两阶段检索：先用二值向量（汉明距离）召回候选，再用浮点向量精确打分（集合需有二值向量字段）
+    SEARCH_BINARY_CANDIDATE_FACTOR: int = 10  # 二值召回的候选数 = limit * 该倍数
 
     MONGO_DB: str = "zkm_test"
     MONGO_HOST: str = "XXX"
@@ -48,14 +50,87 @@ class Settings(BaseSettings):
     MILVUS_DB_PASS: str = ""
     MILVUS_DB_TIMEOUT: int = 30
     MILVUS_DB_COLLECTION_NAME: str = "zkm_test"
+    MILVUS_VECTOR_TYPE: str = "FLOAT_VECTOR"  # 新建集合的向量存储类型：FLOAT_VECTOR / FLOAT16_VECTOR / BFLOAT16_VECTOR（半精度内存减半，BFLOAT16 需安装 ml_dtypes）
+    MILVUS_BINARY_VECTOR_ENABLED: bool = False  # 新建集合时增加二值量化向量字段 embedding_binary，用于两阶段检索
+    MILVUS_BINARY_INDEX_TYPE: str = "BIN_IVF_FLAT"  # 二值向量索引类型：BIN_FLAT / BIN_IVF_FLAT
+    MILVUS_INDEX_TYPE: str = "HNSW"  # 向量索引类型：HNSW / HNSW_SQ / HNSW_PQ / IVF_FLAT / IVF_SQ8 / IVF_PQ / DISKANN / FLAT
+    MILVUS_INDEX_PARAMS: dict = {}  # 建索引参数，覆盖索引类型的默认参数（如 {"M": 32, "efConstruction": 200}）
+    MILVUS_SEARCH_PARAMS: dict = {}  # 检索参数，覆盖索引类型的默认参数（如 {"ef": 128}）
+    MILVUS_COLLECTION_INDEXES: dict = {}  # 按集合配置索引，如 {"集合名": {"index_type": "IVF_PQ", "params": {...}, "search_params": {...}}}
+    MILVUS_NUM_PARTITIONS: int = 64  # 分区键（知识库id）的哈希分区数，创建集合时生效
+    MILVUS_MAX_CONCURRENCY: int = 16  # 异步接口使用的线程池大小，即同时进行的 Milvus 请求数上限
+    MILVUS_SLOW_CALL_MS: int = 500  # 单次请求耗时超过该值（毫秒）时记录告警日志
 
 
     EMBED_SERVER_URL: str = "https://api.jina.ai/v1/embeddings"
     EMBED_SERVER_TOKEN: str = "XXX"
+    EMBED_BACKEND: str = "jina"  # 向量化后端：jina HTTP 服务 / local 本地 CPU 模型 / fake 确定性哈希向量（测试用）
+    EMBED_MODEL_NAME: str = "jina-embeddings-v4"
+    EMBED_DIMENSION: int = 2048  # 向量维度，需与集合维度一致；小于模型维度时截断（jina-embeddings-v4 支持 128~2048）
+    EMBED_LOCAL_MODEL: str = "clip-ViT-B-32"  # 本地模型名称（sentence-transformers，需要另行安装）；输出维度不能小于 EMBED_DIMENSION（clip-ViT-B-32 为 512），启动时检查
+    EMBED_LOCAL_PROCESSES: int = 1  # 本地模型进程数，每个进程加载一份模型
+    EMBED_TASK: str = "text-matching"
+    EMBED_BATCH_SIZE: int = 32  # 入库时单次向量化请求包含的图片数
+    EMBED_MAX_CONCURRENCY: int = 4  # 入库时并发的向量化请求数
+    EMBED_RESPONSE_ENCODING: str = "base64"  # 向量返回格式：base64 为 float32 二进制编码（体积小、解析快）/ float 为 JSON 数组
+    EMBED_IMAGE_INPUT: str = "url"  # 入库时图片的向量化输入：url 先上传再传图片地址 / base64 直接传图片数据，上传与向量化并行
+    EMBED_QUERY_BATCH_ENABLED: bool = True  # 合并并发的检索问题向量化请求
+    EMBED_QUERY_BATCH_SIZE: int = 32  # 单次合并的最大请求数
+    EMBED_QUERY_BATCH_WAIT_MS: int = 5  # 合并等待时间（毫秒）
+    EMBED_CACHE_ENABLED: bool = True  # 缓存检索问题向量
+    EMBED_CACHE_MAX_SIZE: int = 10000  # 内存缓存条数上限（LRU 淘汰）
+    EMBED_CACHE_TTL: int = 7 * 24 * 3600  # 缓存有效期（秒）
+    EMBED_CACHE_DISK_PATH: str = ""  # 本地缓存文件路径（sqlite），为空则只使用内存缓存
+    EMBED_RETRY_MAX_ATTEMPTS: int = 3  # 向量化请求最大尝试次数（超时、网络错误、429、5xx 时重试）
+    EMBED_RETRY_BASE_DELAY: float = 0.2  # 重试退避基准时间（秒），指数增长并加随机抖动
+    EMBED_RETRY_MAX_DELAY: float = 5.0  # 单次重试退避上限（秒）
+    EMBED_REQUEST_DEADLINE: float = 60.0  # 单次向量化调用（含重试）的总时间上限（秒）
+    EMBED_HEDGE_ENABLED: bool = False  # 请求超过近期 p95 耗时仍未返回时发送对冲请求
+    EMBED_HEDGE_DELAY_MS: int = 1000  # 耗时样本不足时使用的对冲延迟（毫秒）
+    EMBED_RATE_LIMIT_RPS: float = 0  # 向量化请求限流（每秒请求数），0 表示不限流
+    EMBED_RATE_LIMIT_BURST: int = 10  # 限流允许的突发请求数
+    EMBED_CIRCUIT_FAILURE_THRESHOLD: int = 5  # 连续失败多少次后熔断
+    EMBED_CIRCUIT_RESET_TIMEOUT: float = 30.0  # 熔断持续时间（秒），之后放行一个试探请求
+    EMBED_HTTP2: bool = True  # 向量化服务使用 HTTP/2（需要安装 h2）
+    EMBED_HTTP_MAX_CONNECTIONS: int = 100  # 连接池最大连接数
+    EMBED_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20  # 连接池保持的空闲连接数
+    EMBED_HTTP_KEEPALIVE_EXPIRY: float = 60.0  # 空闲连接保持时间（秒）
+    EMBED_HTTP_CONNECT_TIMEOUT: float = 5.0  # 建立连接超时（秒）
+    EMBED_HTTP_POOL_TIMEOUT: float = 10.0  # 等待连接池空闲连接超时（秒）
+    EMBED_HTTP_TIMEOUT: float = 30.0  # 读写超时（秒）
+    EMBED_HTTP_WARMUP_CONNECTIONS: int = 2  # 启动时预先建立的连接数，0 表示不预热
+
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # 上传文件分块落盘的块大小（字节）
+    UPLOAD_MAX_SIZE: int = 0  # 单个上传文件大小上限（字节），0 表示不限制
+    UPLOAD_HASH_ALGORITHM: str = "sha256"  # 落盘时顺带计算的文件摘要算法，为空则不计算
 
     IMAGE_DPI: int = 160
     IMAGE_UPLOAD_SERVE: str = "XXXX"
     IMAGE_MAX_WORKERS: int = 4
+    IMAGE_RENDER_MODE: str = "thread"  # 页面渲染模式：thread 线程池 / process 进程池
+    IMAGE_RENDER_PROCESSES: int = 0  # 渲染进程池大小，0 表示使用 CPU 核数
+    IMAGE_RENDER_BATCH_SIZE: int = 8  # 进程模式下单个任务渲染的页数
+    IMAGE_FORMAT: str = "jpeg"  # 页面图片格式 jpeg/png/webp（知识库 image_options 可覆盖以下参数）
+    IMAGE_ENCODER: str = "pil"  # 编码引擎：pil / pymupdf（原生编码，不经过 PIL，不支持 webp 和色度抽样设置）
+    IMAGE_QUALITY: int = 95  # JPEG/WebP 质量
+    IMAGE_CHROMA_SUBSAMPLING: int = 2  # JPEG 色度抽样：0 为 4:4:4，1 为 4:2:2，2 为 4:2:0
+    IMAGE_MAX_PIXELS: int = 0  # 单页最大像素数，超过时按比例降低分辨率，0 表示不限制
+
+    # 流式入库流水线：render -> upload -> embed -> insert
+    PIPELINE_QUEUE_SIZE: int = 16  # 阶段之间队列的最大长度，下游处理不过来时上游阻塞
+    PIPELINE_UPLOAD_CONCURRENCY: int = 8  # 图片上传并发数
+    PIPELINE_INSERT_BATCH_SIZE: int = 80  # 单次写入 Milvus 的条数
+    PIPELINE_BATCH_WAIT_MS: int = 200  # 向量化/写入阶段凑批的最长等待时间（毫秒）
+    INGEST_DEDUP_ENABLED: bool = True  # 按文件/页面内容摘要复用已上传的图片和向量
+    INGEST_JOB_CONCURRENCY: int = 2  # 同时运行的异步入库任务数
+    INGEST_JOB_FILE_CONCURRENCY: int = 2  # 单个任务内同时入库的文件数（每个文件有独立的渲染/上传/向量化并发）
+    INGEST_JOB_FLUSH_INTERVAL: int = 5  # 异步入库任务进度写入 MongoDB 的间隔（秒）
+    INGEST_CHECKPOINT_ENABLED: bool = True  # 记录页面级检查点，入库中断或部分失败后可续传
+    INGEST_LEASE_SECONDS: int = 60  # 文件入库租约时长（秒），入库期间定期续期；租约过期的 running 文件可以续传
+    INGEST_STORAGE_DIR: str = "data/ingest"  # 续传所需源文件的保存目录，文件全部入库后删除
+    INGEST_TEXT_POLICY: str = "image"  # 文本层策略 image/text/text_and_figures（知识库 text_policy 可覆盖）
+    INGEST_TEXT_MIN_CHARS: int = 200  # 页面有效字符数不少于该值才视为可用文本层
+    INGEST_TEXT_MAX_CHARS: int = 8000  # 文本层写入的最大字符数
 
     MODEL_NAME: str = "qwen",
     MODEL_API_KEY: str = "XXX",
@@ -1,12 +1,36 @@
+import asyncio
 import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Dict, Any, Optional, List, Union, Set
+from functools import partial
+from typing import Dict, Any, Callable, Optional, List, Union, Set, TypeVar
 
+import numpy as np
 from loguru import logger
 from pymilvus import DataType
 from pymilvus import MilvusClient, MilvusException
 
 from src.config.config import settings
+from src.db_conn.milvus_index import IndexConfig, get_binary_index_config, get_index_config
+from src.utils.vector import as_vector, binary_quantize, check_storage_type, from_storage_vector, to_storage_vector
+
+T = TypeVar("T")
+
+# 向量字段类型对应的存储精度
+VECTOR_STORAGE_TYPES = {
+    DataType.FLOAT_VECTOR: "float32",
+    DataType.FLOAT16_VECTOR: "float16",
+    DataType.BFLOAT16_VECTOR: "bfloat16",
+}
+
+
+def vector_data_type(name: str) -> DataType:
+    """向量存储类型名称（FLOAT_VECTOR / FLOAT16_VECTOR / BFLOAT16_VECTOR）转换为 DataType"""
+    data_type = getattr(DataType, name.upper(), None)
+    if data_type not in VECTOR_STORAGE_TYPES:
+        raise ValueError(f"Unsupported vector type: {name}")
+    check_storage_type(VECTOR_STORAGE_TYPES[data_type])
+    return data_type
 
 
 @dataclass
@@ -63,6 +87,8 @@ class MilvusClientWrapper:
     COLLECTION_FIELDS = [
         ("id", DataType.INT64, {"is_primary": True, "auto_id": True}),  # 改为自动生成ID
         ("embedding", DataType.FLOAT_VECTOR, {}),
+        # 二值量化向量（MILVUS_BINARY_VECTOR_ENABLED 时创建），用于两阶段检索的召回
+        ("embedding_binary", DataType.BINARY_VECTOR, {}),
         ("image_url", DataType.VARCHAR, {"max_length": 512}),
         ("image_width", DataType.INT64, {}),
         ("image_height", DataType.INT64, {}),
@@ -70,13 +96,16 @@ class MilvusClientWrapper:
         ("file_name", DataType.VARCHAR, {"max_length": 100}),
         ("file_page", DataType.INT64, {}),
         ("file_url", DataType.VARCHAR, {"max_length": 512}),
-        ("knowledge_base_id", DataType.VARCHAR, {"max_length": 100}),
+        # 知识库id作为分区键，按知识库过滤时只检索对应分区
+        ("knowledge_base_id", DataType.VARCHAR, {"max_length": 100, "is_partition_key": True}),
     ]
 
     def __init__(self, connector: MilvusConnector):
         self.connector = connector
         self.collection_name = ''
         self._loaded_collections: Set[str] = set()  # 缓存已加载的集合名称
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._vector_fields: Dict[str, Dict[str, DataType]] = {}  # 缓存集合的向量字段及类型
 
     def _ensure_connected(self) -> None:
         """确保已建立连接"""
@@ -94,10 +123,132 @@ class MilvusClientWrapper:
                 raise TimeoutError(f"Collection {collection_name} loading timeout")
             time.sleep(0.5)
 
+    def has_partition_key(self, collection_name: str) -> bool:
+        """集合是否以 knowledge_base_id 作为分区键"""
+        description = self.connector.client.describe_collection(collection_name)
+        return any(
+            field.get("name") == "knowledge_base_id" and field.get("is_partition_key")
+            for field in description.get("fields", [])
+        )
+
+    def _get_vector_fields(self, collection_name: str) -> Dict[str, DataType]:
+        if collection_name not in self._vector_fields:
+            self._ensure_connected()
+            description = self.connector.client.describe_collection(collection_name)
+            self._vector_fields[collection_name] = {
+                field.get("name"): field.get("type")
+                for field in description.get("fields", [])
+                if field.get("name") in ("embedding", "embedding_binary")
+            }
+        return self._vector_fields[collection_name]
+
+    def get_storage_type(self, collection_name: str) -> str:
+        """集合向量字段的存储精度（float32 / float16 / bfloat16）"""
+        return VECTOR_STORAGE_TYPES.get(self._get_vector_fields(collection_name).get("embedding"), "float32")
+
+    def has_binary_vector(self, collection_name: str) -> bool:
+        """集合是否有二值量化向量字段"""
+        return "embedding_binary" in self._get_vector_fields(collection_name)
+
+    async def ahas_binary_vector(self, collection_name: str) -> bool:
+        """has_binary_vector 的异步版本，未缓存时在线程池中读取集合结构"""
+        if collection_name not in self._vector_fields:
+            await self._run("describe_collection", self._get_vector_fields, collection_name)
+        return self.has_binary_vector(collection_name)
+
+    def get_dimension(self, collection_name: str) -> Optional[int]:
+        """读取集合向量字段的维度"""
+        description = self.connector.client.describe_collection(collection_name)
+        for field in description.get("fields", []):
+            if field.get("name") == "embedding":
+                return int(field.get("params", {}).get("dim", 0)) or None
+        return None
+
+    def create_vector_index(
+            self,
+            collection_name: str,
+            metric_type: str = settings.SEARCH_CONFIG['metric_type'],
+            index_config: Optional[IndexConfig] = None
+    ) -> IndexConfig:
+        """按集合的索引配置创建向量索引"""
+        client = self.connector.client
+        index_config = index_config or get_index_config(collection_name)
+        index_params = client.prepare_index_params()
+        index_params.add_index(
+            field_name="embedding",
+            metric_type=metric_type,
+            index_type=index_config.index_type,
+            params=index_config.params
+        )
+        client.create_index(
+            collection_name=collection_name,
+            index_params=index_params
+        )
+        logger.info(f"Vector index ({index_config.index_type}) created on {collection_name}: {index_config.params}")
+        return index_config
+
+    def create_binary_index(self, collection_name: str) -> IndexConfig:
+        """为二值量化向量字段创建索引（汉明距离）"""
+        client = self.connector.client
+        index_config = get_binary_index_config()
+        index_params = client.prepare_index_params()
+        index_params.add_index(
+            field_name="embedding_binary",
+            metric_type="HAMMING",
+            index_type=index_config.index_type,
+            params=index_config.params
+        )
+        client.create_index(
+            collection_name=collection_name,
+            index_params=index_params
+        )
+        logger.info(f"Binary vector index ({index_config.index_type}) created on {collection_name}")
+        return index_config
+
+    def rebuild_vector_index(
+            self,
+            collection_name: str,
+            index_config: IndexConfig,
+            metric_type: str = settings.SEARCH_CONFIG['metric_type'],
+            timeout: int = 3600
+    ) -> float:
+        """
+        删除并重建向量索引，等待索引构建完成后重新加载集合
+
+        Returns:
+            float: 索引构建耗时（秒）
+        """
+        self._ensure_connected()
+        client = self.connector.client
+        client.release_collection(collection_name)
+        self._loaded_collections.discard(collection_name)
+        self._vector_fields.pop(collection_name, None)
+        client.drop_index(collection_name, "embedding")
+
+        start_time = time.time()
+        self.create_vector_index(collection_name, metric_type, index_config)
+        while True:
+            index = client.describe_index(collection_name, "embedding")
+            if index.get("state") == "Finished" or (
+                    index.get("total_rows", 0) and index.get("indexed_rows", 0) >= index.get("total_rows", 0)
+            ):
+                break
+            if index.get("state") == "Failed":
+                raise RuntimeError(f"Index build failed: {index.get('index_state_fail_reason', '')}")
+            if time.time() - start_time > timeout:
+                raise TimeoutError(f"Index build on {collection_name} timeout")
+            time.sleep(1)
+        build_time = time.time() - start_time
+
+        client.load_collection(collection_name)
+        self._wait_for_collection_load(collection_name, timeout=timeout)
+        self._loaded_collections.add(collection_name)
+        return build_time
+
     def ensure_collection(
             self,
             collection_name: str = settings.MILVUS_DB_COLLECTION_NAME,
-            dimension: int = 2048,
+            dimension: int = settings.EMBED_DIMENSION,
             metric_type: str = settings.SEARCH_CONFIG['metric_type']
     ) -> None:
         """确保集合存在并已加载"""
@@ -114,8 +265,22 @@ class MilvusClientWrapper:
                 logger.warning(f"Collection {collection_name} in cache but not actually loaded")
                 self._loaded_collections.remove(collection_name)
 
+        # 集合可能已按同名重建，重新读取向量字段（启动时读取，检索时不再在事件循环中请求 Milvus）
+        self._vector_fields.pop(collection_name, None)
         try:
             if client.has_collection(collection_name):
+                collection_dimension = self.get_dimension(collection_name)
+                if collection_dimension and collection_dimension != dimension:
+                    raise ValueError(
+                        f"Collection {collection_name} dimension {collection_dimension} != {dimension}, "
+                        f"use init/migrate_milvus_collection.py to build a collection with the new dimension"
+                    )
+                check_storage_type(self.get_storage_type(collection_name))
+                if not self.has_partition_key(collection_name):
+                    logger.warning(
+                        f"Collection {collection_name} has no knowledge_base_id partition key, searches scan all "
+                        f"knowledge bases; use init/migrate_milvus_collection.py to rebuild it"
+                    )
                 logger.info(f"Loading collection: {collection_name}")
                 client.load_collection(collection_name)
                 self._wait_for_collection_load(collection_name)
@@ -133,7 +298,11 @@ class MilvusClientWrapper:
 
             # 添加所有预定义字段
             for field_name, datatype, kwargs in self.COLLECTION_FIELDS:
+                if field_name == "embedding_binary" and not settings.MILVUS_BINARY_VECTOR_ENABLED:
+                    continue
                 if field_name == "embedding":
+                    datatype = vector_data_type(settings.MILVUS_VECTOR_TYPE)
+                if field_name in ("embedding", "embedding_binary"):
                     kwargs["dim"] = dimension
                 schema.add_field(field_name=field_name, datatype=datatype, **kwargs)
 
@@ -141,7 +310,8 @@ class MilvusClientWrapper:
             client.create_collection(
                 collection_name=collection_name,
                 schema=schema,
-                consistency_level="Strong"
+                consistency_level="Strong",
+                num_partitions=settings.MILVUS_NUM_PARTITIONS
             )
 
             # 加载集合（必须先加载才能创建索引）
@@ -150,17 +320,9 @@ class MilvusClientWrapper:
             self._wait_for_collection_load(collection_name)
 
             # 创建向量索引
-            index_params = client.prepare_index_params()
-            index_params.add_index(
-                field_name="embedding",
-                metric_type=metric_type,
-                index_type="HNSW",
-                params={"M": 32, "efConstruction": 200}
-            )
-            client.create_index(
-                collection_name=collection_name,
-                index_params=index_params
-            )
+            self.create_vector_index(collection_name, metric_type)
+            if settings.MILVUS_BINARY_VECTOR_ENABLED:
+                self.create_binary_index(collection_name)
 
             # 为标量字段创建索引
             scalar_index_params = client.prepare_index_params()
@@ -178,6 +340,7 @@ class MilvusClientWrapper:
 
             logger.info(f"Collection {collection_name} created and indexed successfully")
             self._loaded_collections.add(collection_name)
+            self._get_vector_fields(collection_name)
 
         except MilvusException as e:
             logger.error(f"Milvus operation failed: {str(e)}")
@@ -186,12 +349,17 @@ class MilvusClientWrapper:
             logger.error(f"Unexpected error: {str(e)}")
             raise
 
-    def query(self, filter: str, output_fields: Optional[List[str]]) -> List[Dict[str, Any]]:
+    def query(
+            self,
+            filter: str,
+            output_fields: Optional[List[str]],
+            collection_name: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
         self._ensure_connected()
         client = self.connector.client
         try:
             result = client.query(
-                collection_name=self.collection_name,
+                collection_name=collection_name or self.collection_name,
                 filter=filter,
                 output_fields=output_fields
             )
@@ -203,30 +371,42 @@ class MilvusClientWrapper:
             logger.error(f"Unexpected error: {str(e)}")
             raise
 
-    def insert(self, data: Union[Dict[str, Any], List[Dict[str, Any]]]) -> List:
-        """插入数据"""
+    def insert(
+            self,
+            data: Union[Dict[str, Any], List[Dict[str, Any]]],
+            collection_name: Optional[str] = None
+    ) -> List:
+        """插入数据（向量按集合的存储精度转换）"""
         self._ensure_connected()
         client = self.connector.client
+        collection_name = collection_name or self.collection_name
 
         try:
             if isinstance(data, dict):
                 data = [data]
+            storage_type = self.get_storage_type(collection_name)
+            with_binary = self.has_binary_vector(collection_name)
 
             # 验证数据格式
             for item in data:
                 if "embedding" not in item:
                     raise ValueError("Data item is missing 'embedding' field")
-                if not isinstance(item["embedding"], list) or len(item["embedding"]) == 0:
-                    raise ValueError("Embedding must be a non-empty list")
+                if not isinstance(item["embedding"], (list, np.ndarray)) or len(item["embedding"]) == 0:
+                    raise ValueError("Embedding must be a non-empty list or array")
 
                 # 移除用户可能提供的ID（因为auto_id=True）
                 if "id" in item:
                     logger.warning("Removing user-provided ID as auto_id=True")
                     del item["id"]
+                # 二值向量由浮点向量生成，保证两者一致
+                if with_binary:
+                    item["embedding_binary"] = binary_quantize(item["embedding"])
+                if storage_type != "float32":
+                    item["embedding"] = to_storage_vector(item["embedding"], storage_type)
 
             # 使用原始数据（动态字段支持）
-            result = client.insert(self.collection_name, data)
-            logger.info(f"Successfully inserted {len(result['ids'])} records into {self.collection_name}")
+            result = client.insert(collection_name, data)
+            logger.info(f"Successfully inserted {len(result['ids'])} records into {collection_name}")
             return result['ids']
         except MilvusException as e:
             logger.error(f"Failed to insert data: {str(e)}")
@@ -235,14 +415,33 @@ class MilvusClientWrapper:
             logger.error(f"Unexpected error: {str(e)}")
             raise
 
+    def delete(self, filter: str, collection_name: Optional[str] = None) -> int:
+        """按过滤条件删除数据，返回删除条数"""
+        self._ensure_connected()
+        client = self.connector.client
+        collection_name = collection_name or self.collection_name
+
+        try:
+            result = client.delete(collection_name=collection_name, filter=filter)
+            delete_count = result.get("delete_count", 0) if isinstance(result, dict) else len(result or [])
+            logger.info(f"Successfully deleted {delete_count} records from {collection_name}")
+            return delete_count
+        except MilvusException as e:
+            logger.error(f"Failed to delete data: {str(e)}")
+            raise
+        except Exception as e:
+            logger.error(f"Unexpected error: {str(e)}")
+            raise
+
     def search(
             self,
-            query_vectors: List[List[float]],
+            query_vectors: List[Union[List[float], np.ndarray]],
             search_params: Dict[str, Any],
             limit: int = 10,
             output_fields: Optional[List[str]] = None,
             collection_name: Optional[str] = None,
-            filter: Optional[str] = None
+            filter: Optional[str] = None,
+            anns_field: str = "embedding"
     ) -> list[list[dict]]:
 
         self._ensure_connected()
@@ -252,13 +451,18 @@ class MilvusClientWrapper:
         try:
             if not query_vectors:
                 raise ValueError("Query vectors cannot be empty")
-            if not isinstance(query_vectors[0], list) or not query_vectors[0]:
-                raise ValueError("Query vectors must be non-empty lists")
+            if not isinstance(query_vectors[0], (list, np.ndarray, bytes)) or len(query_vectors[0]) == 0:
+                raise ValueError("Query vectors must be non-empty lists, arrays or bytes")
 
             # 确保集合已加载
             if collection_name not in self._loaded_collections:
                 self.ensure_collection(collection_name)
 
+            # 半精度集合的检索向量需要转换为相同精度
+            storage_type = self.get_storage_type(collection_name)
+            if anns_field == "embedding" and storage_type != "float32":
+                query_vectors = [to_storage_vector(vector, storage_type) for vector in query_vectors]
+
             # 设置默认搜索参数
             default_params = {"metric_type": "L2", "params": {"nprobe": 10}}
             merged_params = {**default_params, **(search_params or {})}
@@ -266,7 +470,7 @@ class MilvusClientWrapper:
             results = client.search(
                 collection_name=collection_name,
                 data=query_vectors,
-                anns_field="embedding",
+                anns_field=anns_field,
                 search_params=merged_params,
                 limit=limit,
                 output_fields=output_fields or [],
@@ -281,6 +485,143 @@ class MilvusClientWrapper:
             logger.error(f"Unexpected error: {str(e)}")
             raise
 
+    def binary_rescore_search(
+            self,
+            query_vectors: List[Union[List[float], np.ndarray]],
+            limit: int = 10,
+            candidate_limit: int = 100,
+            output_fields: Optional[List[str]] = None,
+            collection_name: Optional[str] = None,
+            filter: Optional[str] = None,
+            metric_type: str = settings.SEARCH_CONFIG['metric_type']
+    ) -> list[list[dict]]:
+        """
+        两阶段检索：先在二值量化向量上按汉明距离召回 candidate_limit 个候选，
+        再用候选的浮点向量与检索向量精确计算相似度（IP 越大越相似，L2 越小越相似），返回前 limit 个
+
+        返回结果格式与 search 相同，distance 为精确计算的相似度
+        """
+        collection_name = collection_name or self.collection_name
+        storage_type = self.get_storage_type(collection_name)
+        query_vectors = [as_vector(vector) for vector in query_vectors]
+        candidates = self.search(
+            query_vectors=[binary_quantize(vector) for vector in query_vectors],
+            search_params={"metric_type": "HAMMING", "params": get_binary_index_config().search_params},
+            limit=max(candidate_limit, limit),
+            output_fields=list(dict.fromkeys([*(output_fields or []), "embedding"])),
+            collection_name=collection_name,
+            filter=filter,
+            anns_field="embedding_binary"
+        )
+
+        keep_embedding = "embedding" in (output_fields or [])
+        results = []
+        for query, hits in zip(query_vectors, candidates):
+            if not hits:
+                results.append([])
+                continue
+            vectors = np.vstack([from_storage_vector(hit["entity"]["embedding"], storage_type) for hit in hits])
+            if metric_type == "L2":
+                scores = ((vectors - query) ** 2).sum(axis=1)
+                order = np.argsort(scores)[:limit]
+            else:
+                scores = vectors @ query
+                order = np.argsort(-scores)[:limit]
+
+            rescored = []
+            for i in order:
+                entity = dict(hits[i]["entity"])
+                if not keep_embedding:
+                    entity.pop("embedding", None)
+                rescored.append({"id": hits[i]["id"], "distance": float(scores[i]), "entity": entity})
+            results.append(rescored)
+        return results
+
+    # ---------- 异步接口：同步调用放到有界线程池中执行，不阻塞事件循环 ----------
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=settings.MILVUS_MAX_CONCURRENCY,
+                thread_name_prefix="milvus"
+            )
+        return self._executor
+
+    async def _run(self, operation: str, fn: Callable[..., T], *args, **kwargs) -> T:
+        """在线程池中执行同步调用，并记录耗时（含排队时间）"""
+        start_time = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, partial(fn, *args, **kwargs))
+        finally:
+            elapsed = (time.perf_counter() - start_time) * 1000
+            if elapsed > settings.MILVUS_SLOW_CALL_MS:
+                logger.warning(f"Milvus {operation} slow: {elapsed:.1f}ms")
+            else:
+                logger.debug(f"Milvus {operation}: {elapsed:.1f}ms")
+
+    async def asearch(
+            self,
+            query_vectors: List[Union[List[float], np.ndarray]],
+            search_params: Dict[str, Any],
+            limit: int = 10,
+            output_fields: Optional[List[str]] = None,
+            collection_name: Optional[str] = None,
+            filter: Optional[str] = None
+    ) -> list[list[dict]]:
+        return await self._run(
+            "search", self.search,
+            query_vectors=query_vectors,
+            search_params=search_params,
+            limit=limit,
+            output_fields=output_fields,
+            collection_name=collection_name,
+            filter=filter
+        )
+
+    async def abinary_rescore_search(
+            self,
+            query_vectors: List[Union[List[float], np.ndarray]],
+            limit: int = 10,
+            candidate_limit: int = 100,
+            output_fields: Optional[List[str]] = None,
+            collection_name: Optional[str] = None,
+            filter: Optional[str] = None
+    ) -> list[list[dict]]:
+        return await self._run(
+            "binary_rescore_search", self.binary_rescore_search,
+            query_vectors=query_vectors,
+            limit=limit,
+            candidate_limit=candidate_limit,
+            output_fields=output_fields,
+            collection_name=collection_name,
+            filter=filter
+        )
+
+    async def aquery(
+            self,
+            filter: str,
+            output_fields: Optional[List[str]],
+            collection_name: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        return await self._run("query", self.query, filter, output_fields, collection_name)
+
+    async def ainsert(
+            self,
+            data: Union[Dict[str, Any], List[Dict[str, Any]]],
+            collection_name: Optional[str] = None
+    ) -> List:
+        return await self._run("insert", self.insert, data, collection_name)
+
+    async def adelete(self, filter: str, collection_name: Optional[str] = None) -> int:
+        return await self._run("delete", self.delete, filter, collection_name)
+
+    def close(self) -> None:
+        """关闭线程池（等待执行中的请求完成）"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
 
 _milvus_client: Optional[MilvusClientWrapper] = None
 
@@ -0,0 +1,104 @@
+"""
+Milvus 向量索引配置
+
+索引类型和参数可以按集合配置：MILVUS_INDEX_TYPE / MILVUS_INDEX_PARAMS / MILVUS_SEARCH_PARAMS 为默认值，
+MILVUS_COLLECTION_INDEXES 按集合覆盖。检索参数与索引类型对应（HNSW 用 ef，IVF 用 nprobe，DiskANN 用 search_list）
+"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from src.config.config import settings
+
+
+@dataclass(frozen=True)
+class IndexPreset:
+    build_params: Dict[str, Any]
+    search_params: Dict[str, Any]
+
+
+# 各索引类型的默认参数（HNSW_SQ/HNSW_PQ 需要服务端支持，Milvus 2.6+）
+INDEX_PRESETS: Dict[str, IndexPreset] = {
+    "FLAT": IndexPreset({}, {}),
+    "HNSW": IndexPreset({"M": 32, "efConstruction": 200}, {"ef": 128}),
+    "HNSW_SQ": IndexPreset({"M": 32, "efConstruction": 200, "sq_type": "SQ8"}, {"ef": 128}),
+    "HNSW_PQ": IndexPreset({"M": 32, "efConstruction": 200, "m": 128, "nbits": 8}, {"ef": 128}),
+    "IVF_FLAT": IndexPreset({"nlist": 1024}, {"nprobe": 32}),
+    "IVF_SQ8": IndexPreset({"nlist": 1024}, {"nprobe": 32}),
+    "IVF_PQ": IndexPreset({"nlist": 1024, "m": 128, "nbits": 8}, {"nprobe": 32}),
+    "DISKANN": IndexPreset({}, {"search_list": 100}),
+    # 二值向量索引（汉明距离）
+    "BIN_FLAT": IndexPreset({}, {}),
+    "BIN_IVF_FLAT": IndexPreset({"nlist": 1024}, {"nprobe": 32}),
+}
+
+
+@dataclass(frozen=True)
+class IndexConfig:
+    index_type: str = "HNSW"
+    params: Dict[str, Any] = field(default_factory=dict)  # 建索引参数
+    search_params: Dict[str, Any] = field(default_factory=dict)  # 检索参数
+
+    @classmethod
+    def create(
+            cls,
+            index_type: str,
+            params: Optional[Dict[str, Any]] = None,
+            search_params: Optional[Dict[str, Any]] = None
+    ) -> "IndexConfig":
+        """以索引类型的默认参数为基础，合并指定的参数"""
+        index_type = index_type.upper()
+        if index_type not in INDEX_PRESETS:
+            raise ValueError(f"Unsupported index type: {index_type}, choose from {', '.join(INDEX_PRESETS)}")
+        preset = INDEX_PRESETS[index_type]
+        return cls(
+            index_type=index_type,
+            params={**preset.build_params, **(params or {})},
+            search_params={**preset.search_params, **(search_params or {})},
+        )
+
+    def estimate_memory(self, num_rows: int, dimension: int, element_size: int = 4) -> int:
+        """估算索引常驻内存（字节），只用于比较不同索引的量级，不含 Milvus 自身开销；element_size 为向量元素字节数"""
+        raw = num_rows * dimension * element_size
+        if self.index_type == "FLAT":
+            return raw
+        if self.index_type.startswith("HNSW"):
+            graph = num_rows * self.params.get("M", 32) * 2 * 8
+            if self.index_type == "HNSW_SQ":
+                return num_rows * dimension + graph
+            if self.index_type == "HNSW_PQ":
+                return num_rows * self.params["m"] * self.params["nbits"] // 8 + graph
+            return raw + graph
+        centroids = self.params.get("nlist", 0) * dimension * 4
+        if self.index_type == "IVF_SQ8":
+            return num_rows * dimension + centroids
+        if self.index_type == "IVF_PQ":
+            return num_rows * self.params["m"] * self.params["nbits"] // 8 + centroids
+        if self.index_type == "DISKANN":
+            # 内存中只保留 PQ 压缩向量，默认 pq_code_budget_gb_ratio 为 0.125
+            return raw // 8
+        return raw + centroids
+
+
+def get_index_config(collection_name: Optional[str] = None) -> IndexConfig:
+    """读取集合的索引配置，未单独配置的集合使用默认配置"""
+    collection_config = settings.MILVUS_COLLECTION_INDEXES.get(collection_name or settings.MILVUS_DB_COLLECTION_NAME)
+    if collection_config:
+        return IndexConfig.create(
+            collection_config.get("index_type", settings.MILVUS_INDEX_TYPE),
+            collection_config.get("params"),
+            collection_config.get("search_params"),
+        )
+    return IndexConfig.create(settings.MILVUS_INDEX_TYPE, settings.MILVUS_INDEX_PARAMS, settings.MILVUS_SEARCH_PARAMS)
+
+
+def get_binary_index_config() -> IndexConfig:
+    """二值量化向量字段的索引配置"""
+    return IndexConfig.create(settings.MILVUS_BINARY_INDEX_TYPE)
+
+
+def get_search_params(collection_name: Optional[str] = None) -> Dict[str, Any]:
+    """集合检索参数：度量类型取 SEARCH_CONFIG，params 与集合的索引类型对应"""
+    return {
+        "metric_type": settings.SEARCH_CONFIG["metric_type"],
+        "params": get_index_config(collection_name).search_params,
+    }
@@ -9,11 +9,15 @@ from opentelemetry import trace
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
 from opentelemetry.sdk.trace import TracerProvider
 
+from src.api.doc2kb import get_ingest_job_manager, get_pdf_service
 from src.config.config import settings
 from src.config.openapi_docs import get_swagger_ui_html
 from src.db_conn.mongo import init_mongo_db, close_mongo_db
 from src.handlers import include_routers
 from src.middleware.log import init_stdout_logger
+from src.service.embedding_backends import init_embedding_backend, close_embedding_backend
+from src.service.embedding_cache import close_embedding_cache
+from src.third_party_service.http_client import init_http_client, close_http_client
 from src.db_conn.milvus import get_milvus_client as milvus
 
 # 根据是否 debug 获取 api 文档地址, 非 debug 就加上 nginx 配置的路由地址, 这样可以正确访问到项目的静态资源
@@ -47,10 +51,20 @@ async def lifespan(app: FastAPI):
     logger.info("Starting up")
     init_mongo_db()
     milvus().ensure_collection(settings.MILVUS_DB_COLLECTION_NAME)
+    await init_http_client()
+    await init_embedding_backend()
 
     try:
         yield
     finally:
+        # 中断未完成的异步入库任务
+        await get_ingest_job_manager().shutdown()
+        # 关闭渲染进程池和线程池，避免残留子进程
+        get_pdf_service().shutdown()
+        await close_http_client()
+        close_embedding_backend()
+        close_embedding_cache()
+        milvus().close()
         close_mongo_db()
 
         logger.info("Application shutdown")
@@ -1,7 +1,7 @@
 import datetime
 
 from bson import ObjectId
-from mongoengine import Document, DateTimeField, StringField, ListField
+from mongoengine import Document, DateTimeField, StringField, ListField, IntField, FloatField, DictField
 
 
 class BaseDocument(Document):
@@ -69,6 +69,8 @@ class KnowledgeBase(BaseDocument):
     }
     knowledge_name = StringField()  # 知识库名称
     knowledge_description = StringField()  # 知识库描述
+    image_options = DictField()  # 页面图片渲染与编码参数（覆盖全局默认值）
+    text_policy = StringField()  # 文本层策略 image/text/text_and_figures，为空时使用全局默认值
 
 
 class Files(BaseDocument):
@@ -81,3 +83,58 @@ class Files(BaseDocument):
     file_url = StringField()  # 文件url
     file_type = StringField()  # 文件类型
     knowledge_base_id = StringField()  # 知识库id
+    file_hash = StringField()  # 文件内容摘要
+    file_path = StringField()  # 入库未完成时保留的源文件路径（用于续传）
+    page_count = IntField()  # 总页数
+    ingest_status = StringField()  # 入库状态 running/success/partial
+    ingest_owner = StringField()  # 持有入库租约的进程（running 时有效）
+    ingest_heartbeat = DateTimeField()  # 入库租约的最近续期时间，超过 INGEST_LEASE_SECONDS 未续期视为进程已中断
+
+
+class PageCheckpoint(BaseDocument):
+    """页面级入库检查点"""
+    meta = {
+        'collection': 'page_checkpoint',  # 映射到数据库 page_checkpoint 集合
+        'indexes': [('file_id', 'file_page')],
+    }
+    file_id = StringField()  # 文件id
+    file_page = IntField()  # 页码
+    status = StringField()  # done: 已写入向量数据库 / failed: 处理失败
+    error = StringField()  # 失败原因
+
+
+class DocumentCache(BaseDocument):
+    """文件内容摘要 -> 各页渲染结果摘要"""
+    meta = {
+        'collection': 'document_cache',  # 映射到数据库 document_cache 集合
+        'indexes': [('doc_hash', 'render_key')],
+    }
+    doc_hash = StringField()  # 文件内容摘要
+    render_key = StringField()  # 渲染参数（参数不同渲染结果不同）
+    page_hashes = DictField()  # 页码 -> 页面图片摘要
+
+
+class PageCache(BaseDocument):
+    """页面图片摘要 -> 已上传的图片地址和向量"""
+    meta = {
+        'collection': 'page_cache',  # 映射到数据库 page_cache 集合
+        'indexes': [('page_hash', 'embed_model')],
+    }
+    page_hash = StringField()  # 页面图片摘要
+    embed_model = StringField()  # 向量模型
+    image_url = StringField()  # 图片地址
+    image_width = IntField()  # 图片宽度
+    image_height = IntField()  # 图片高度
+    embedding = ListField(FloatField())  # 向量
+
+
+class IngestJob(BaseDocument):
+    """异步入库任务"""
+    meta = {
+        'collection': 'ingest_job',  # 映射到数据库 ingest_job 集合
+        'indexes': ['knowledge_base_id'],
+    }
+    knowledge_base_id = StringField()  # 知识库id
+    status = StringField()  # 任务状态 pending/running/success/partial/failed/cancelled
+    files = ListField(DictField(), default=list)  # 各文件入库进度
+    error = StringField()  # 错误信息
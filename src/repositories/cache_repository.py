@@ -0,0 +1,74 @@
+import datetime
+import traceback
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from src.models.mongo import DocumentCache, PageCache
+
+
+async def select_document_cache(doc_hash: str, render_key: str) -> Optional[DocumentCache]:
+    """根据文件摘要和渲染参数查询各页摘要"""
+    try:
+        return DocumentCache.objects(doc_hash=doc_hash, render_key=render_key).first()
+    except Exception as e:
+        logger.error(f"Error selecting document cache: {traceback.format_exc()}")
+        return None
+
+
+async def save_document_cache(doc_hash: str, render_key: str, page_hashes: Dict[int, str]) -> None:
+    """合并保存文件各页摘要"""
+    if not page_hashes:
+        return
+    try:
+        now = datetime.datetime.now()
+        DocumentCache.objects(doc_hash=doc_hash, render_key=render_key).update_one(
+            upsert=True,
+            set_on_insert__create_time=now,
+            set__update_time=now,
+            **{f"set__page_hashes__{page}": page_hash for page, page_hash in page_hashes.items()}
+        )
+    except Exception as e:
+        logger.error(f"Error saving document cache: {traceback.format_exc()}")
+
+
+async def select_page_cache(
+        page_hashes: List[str],
+        embed_model: str,
+        only_hash: bool = False
+) -> Dict[str, PageCache]:
+    """批量查询页面缓存，返回 页面摘要 -> 缓存；only_hash=True 时只查询摘要，用于判断是否存在"""
+    if not page_hashes:
+        return {}
+    try:
+        caches = PageCache.objects(page_hash__in=list(set(page_hashes)), embed_model=embed_model)
+        if only_hash:
+            caches = caches.only('page_hash')
+        return {cache.page_hash: cache for cache in caches}
+    except Exception as e:
+        logger.error(f"Error selecting page cache: {traceback.format_exc()}")
+        return {}
+
+
+async def save_page_cache(pages: List[Dict], embed_model: str) -> None:
+    """
+    批量保存页面缓存
+
+    Args:
+        pages: 每个元素包含 page_hash/image_url/image_width/image_height/embedding
+        embed_model: 向量模型
+    """
+    try:
+        now = datetime.datetime.now()
+        for page in pages:
+            PageCache.objects(page_hash=page["page_hash"], embed_model=embed_model).update_one(
+                upsert=True,
+                set_on_insert__create_time=now,
+                set__update_time=now,
+                set__image_url=page["image_url"],
+                set__image_width=page["image_width"],
+                set__image_height=page["image_height"],
+                set__embedding=page["embedding"].tolist(),
+            )
+    except Exception as e:
+        logger.error(f"Error saving page cache: {traceback.format_exc()}")
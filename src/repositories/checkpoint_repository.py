@@ -0,0 +1,40 @@
+import datetime
+import traceback
+from typing import List, Set
+
+from loguru import logger
+from pymongo import UpdateOne
+
+from src.models.mongo import PageCheckpoint
+
+
+async def save_page_checkpoints(file_id: str, pages: List[int], status: str, error: str = "") -> None:
+    """批量记录页面检查点（同一页覆盖旧记录）"""
+    if not pages:
+        return
+    try:
+        now = datetime.datetime.now()
+        PageCheckpoint._get_collection().bulk_write([
+            UpdateOne(
+                {"file_id": file_id, "file_page": page},
+                {
+                    "$set": {"status": status, "error": error, "update_time": now},
+                    "$setOnInsert": {"create_time": now},
+                },
+                upsert=True
+            )
+            for page in pages
+        ], ordered=False)
+    except Exception as e:
+        logger.error(f"Error saving page checkpoints: {traceback.format_exc()}")
+        raise Exception("Error saving page checkpoints")
+
+
+async def select_done_pages(file_id: str) -> Set[int]:
+    """查询已写入向量数据库的页码"""
+    try:
+        checkpoints = PageCheckpoint.objects(file_id=file_id, status="done").only('file_page')
+        return {checkpoint.file_page for checkpoint in checkpoints}
+    except Exception as e:
+        logger.error(f"Error selecting page checkpoints: {traceback.format_exc()}")
+        raise Exception("Error selecting page checkpoints")
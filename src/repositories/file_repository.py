@@ -1,6 +1,8 @@
+import datetime
 import traceback
 
 from loguru import logger
+from mongoengine.queryset.visitor import Q
 
 from src.models.mongo import Files
 
@@ -11,6 +13,11 @@ async def create_file_data(
         file_url: str,
         file_type: str,
         knowledge_base_id: str,
+        file_hash: str = "",
+        file_path: str = "",
+        page_count: int = 0,
+        ingest_status: str = "running",
+        ingest_owner: str = "",
 ) -> Files:
     try:
         session = Files.objects.create(
@@ -18,7 +25,13 @@ async def create_file_data(
             file_size=file_size,
             file_url=file_url,
             file_type=file_type,
-            knowledge_base_id=knowledge_base_id
+            knowledge_base_id=knowledge_base_id,
+            file_hash=file_hash,
+            file_path=file_path,
+            page_count=page_count,
+            ingest_status=ingest_status,
+            ingest_owner=ingest_owner,
+            ingest_heartbeat=datetime.datetime.now() if ingest_owner else None
         )
         session.save()
         return session
@@ -67,3 +80,63 @@ async def update_file_data(
     except Exception as e:
         logger.error(f"Error updating file: {traceback.format_exception()}")
         raise Exception("Error updating file")
+
+
+async def update_file_ingest_status(file_id: str, ingest_status: str, file_path: str = None):
+    try:
+        session = Files.objects.get(id=file_id)
+        session.ingest_status = ingest_status
+        if file_path is not None:
+            session.file_path = file_path
+        session.save()
+        return session
+    except Exception as e:
+        logger.error(f"Error updating file ingest status: {traceback.format_exc()}")
+        return None
+
+
+async def claim_file_ingest(file_id: str, owner: str, lease_seconds: int) -> bool:
+    """
+    原子地获取文件入库租约：文件未全部入库，且不在入库中（或入库进程的租约已过期）时才能获取
+
+    Returns:
+        bool: 是否获取成功
+    """
+    try:
+        now = datetime.datetime.now()
+        expired = now - datetime.timedelta(seconds=lease_seconds)
+        return bool(Files.objects(
+            Q(id=file_id) & Q(ingest_status__ne="success") & (
+                Q(ingest_status__ne="running") | Q(ingest_heartbeat=None) | Q(ingest_heartbeat__lt=expired)
+            )
+        ).update_one(
+            set__ingest_status="running",
+            set__ingest_owner=owner,
+            set__ingest_heartbeat=now,
+            set__update_time=now
+        ))
+    except Exception as e:
+        logger.error(f"Error claiming file ingest: {traceback.format_exc()}")
+        raise Exception("Error claiming file ingest")
+
+
+async def renew_file_ingest(file_id: str, owner: str) -> bool:
+    """续期入库租约，租约已被其他进程获取时返回 False"""
+    try:
+        return bool(Files.objects(id=file_id, ingest_owner=owner).update_one(
+            set__ingest_heartbeat=datetime.datetime.now()
+        ))
+    except Exception as e:
+        logger.error(f"Error renewing file ingest: {traceback.format_exc()}")
+        return False
+
+
+async def release_file_ingest(file_id: str, owner: str) -> None:
+    """释放入库租约（入库异常结束、状态仍为 running 的文件可以立即续传）"""
+    try:
+        Files.objects(id=file_id, ingest_owner=owner).update_one(
+            set__ingest_owner="",
+            set__ingest_heartbeat=None
+        )
+    except Exception as e:
+        logger.error(f"Error releasing file ingest: {traceback.format_exc()}")
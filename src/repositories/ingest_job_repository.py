@@ -0,0 +1,47 @@
+import traceback
+from typing import List, Dict, Optional
+
+from loguru import logger
+
+from src.models.mongo import IngestJob
+
+
+async def create_ingest_job(knowledge_base_id: str, files: List[Dict]) -> IngestJob:
+    try:
+        job = IngestJob.objects.create(
+            knowledge_base_id=knowledge_base_id,
+            status="pending",
+            files=files,
+            error=""
+        )
+        job.save()
+        return job
+    except Exception as e:
+        logger.error(f"Error creating ingest job: {traceback.format_exc()}")
+        raise Exception("Error creating ingest job")
+
+
+async def update_ingest_job(
+        job_id: str,
+        status: str,
+        files: List[Dict],
+        error: str = ""
+) -> Optional[IngestJob]:
+    try:
+        job = IngestJob.objects.get(id=job_id)
+        job.status = status
+        job.files = files
+        job.error = error
+        job.save()
+        return job
+    except Exception as e:
+        logger.error(f"Error updating ingest job: {traceback.format_exc()}")
+        return None
+
+
+async def select_ingest_job(job_id: str) -> Optional[IngestJob]:
+    try:
+        return IngestJob.objects(id=job_id).first()
+    except Exception as e:
+        logger.error(f"Error selecting ingest job: {traceback.format_exc()}")
+        return None
@@ -1,6 +1,6 @@
 import math
 import traceback
-from typing import Optional
+from typing import Optional, Dict, Any
 
 from fastapi import Query, HTTPException
 from loguru import logger
@@ -12,11 +12,15 @@ from src.models.mongo import KnowledgeBase, Files
 async def create_knowledge_base(
         knowledge_description: str,
         knowledge_name: str,
+        image_options: Optional[Dict[str, Any]] = None,
+        text_policy: Optional[str] = None,
 ) -> KnowledgeBase:
     try:
         session = KnowledgeBase.objects.create(
             knowledge_description=knowledge_description,
             knowledge_name=knowledge_name,
+            image_options=image_options or {},
+            text_policy=text_policy,
         )
         session.save()
         return session
@@ -40,11 +44,17 @@ async def update_knowledge_base(
         knowledge_base_id: str,
         knowledge_description: str,
         knowledge_name: str,
+        image_options: Optional[Dict[str, Any]] = None,
+        text_policy: Optional[str] = None,
 ) -> KnowledgeBase:
     try:
         session = KnowledgeBase.objects.get(id=knowledge_base_id)
         session.knowledge_description = knowledge_description
         session.knowledge_name = knowledge_name
+        if image_options is not None:
+            session.image_options = image_options
+        if text_policy is not None:
+            session.text_policy = text_policy
         session.save()
         return session
     except Exception as e:
@@ -52,6 +62,15 @@ async def update_knowledge_base(
         raise Exception("Error updating knowledge_base")
 
 
+async def select_knowledge_base(knowledge_base_id: str) -> Optional[KnowledgeBase]:
+    """按id查询知识库，不存在（或id格式不正确）时返回 None"""
+    try:
+        return KnowledgeBase.objects(id=knowledge_base_id).first()
+    except Exception as e:
+        logger.debug(f"select knowledge_base {knowledge_base_id} error: {str(e)}")
+        return None
+
+
 async def select_knowledge_bases(
         page: int = Query(default=1, description="页码", ge=1),
         page_size: int = Query(default=10, description="每页数量", ge=1, le=100),
@@ -5,3 +5,7 @@ from pydantic import BaseModel, Field
 
 class DocKnowledgeBase(BaseModel):
     file_urls: List[str] = Field(default=[], description="File URLs")
+
+
+class ResumeIngestParams(BaseModel):
+    file_id: str = Field(..., description="需要续传的文件id")
@@ -1,15 +1,33 @@
+from typing import Literal, Optional
+
 from pydantic import BaseModel, Field
 
+from src.utils.pdf_render import TextPolicy
+
+
+class ImageOptionsParams(BaseModel):
+    """页面图片渲染与编码参数，未设置的字段使用全局默认值"""
+    format: Optional[Literal["jpeg", "png", "webp"]] = Field(default=None, description="图片格式")
+    engine: Optional[Literal["pil", "pymupdf"]] = Field(default=None, description="编码引擎")
+    dpi: Optional[int] = Field(default=None, ge=36, le=600, description="渲染分辨率")
+    quality: Optional[int] = Field(default=None, ge=1, le=100, description="JPEG/WebP 质量")
+    chroma_subsampling: Optional[Literal[0, 1, 2]] = Field(default=None, description="JPEG 色度抽样：0 为 4:4:4，1 为 4:2:2，2 为 4:2:0")
+    max_pixels: Optional[int] = Field(default=None, ge=0, description="单页最大像素数，0 表示不限制")
+
 
 class CreateKnowledgeBaseParams(BaseModel):
     knowledge_base_name: str = Field(default="", description="知识库名字")
     knowledge_description: str = Field(default="", description="知识库描述")
+    image_options: Optional[ImageOptionsParams] = Field(default=None, description="页面图片参数")
+    text_policy: Optional[TextPolicy] = Field(default=None, description="文本层策略")
 
 
 class UpdateKnowledgeBaseParams(BaseModel):
     knowledge_base_id: str = Field(default="", description="知识库ID")
     knowledge_base_name: str = Field(default="", description="知识库名字")
     knowledge_description: str = Field(default="", description="知识库描述")
+    image_options: Optional[ImageOptionsParams] = Field(default=None, description="页面图片参数，不传则不修改")
+    text_policy: Optional[TextPolicy] = Field(default=None, description="文本层策略，不传则不修改")
 
 
 class SelectKnowledgeBaseParams(BaseModel):
@@ -1,10 +1,22 @@
-from typing import List
+from typing import Annotated, Optional
 
-from pydantic import BaseModel, Field
+import numpy as np
+from pydantic import BaseModel, BeforeValidator, ConfigDict, Field, PlainSerializer
+
+from src.utils.vector import as_vector
+
+# 向量保持为 float32 数组，只做一次类型转换，不逐元素校验；序列化为 JSON 时转换为列表
+Vector = Annotated[
+    np.ndarray,
+    BeforeValidator(as_vector),
+    PlainSerializer(lambda v: v.tolist(), return_type=list, when_used="json"),
+]
 
 
 class EmbedData(BaseModel):
-    embedding: List[float] = Field(default=[], description="embedding 向量数据")
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    embedding: Vector = Field(default_factory=lambda: as_vector([]), description="embedding 向量数据")
     image_url: str = Field(default="", description="图片地址")
     image_width: int = Field(description="图片宽度")
     image_height: int = Field(description="图片长度")
@@ -13,6 +25,7 @@ class EmbedData(BaseModel):
     file_page: int = Field(description="图片所属文件的页码")
     file_url: str = Field(default="", description="所属文件地址")
     knowledge_base_id: str = Field(default="", description="知识库id")
+    page_text: Optional[str] = Field(default=None, description="页面文本（文本层入库时写入动态字段）")
 
     def to_json(self, indent: int = None) -> str:
         """
@@ -22,9 +35,9 @@ class EmbedData(BaseModel):
 
     def to_dict(self) -> dict:
         """
-        将对象转换为字典
+        将对象转换为字典（未设置的可选字段不写入）
         """
-        return self.model_dump()
+        return self.model_dump(exclude_none=True)
 
     @classmethod
     def from_json(cls, json_str: str) -> 'EmbedData':
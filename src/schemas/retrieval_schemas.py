@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -9,3 +9,8 @@ class SearchDocumentImagesParams(BaseModel):
     file_ids: List[str] = Field(default=[], description="指定文件id")
     min_similarity: float = Field(default=0.6, description="相似度阈值")
     limit: int = Field(default=10, description="获取多少个")
+    binary_rescore: Optional[bool] = Field(default=None, description="两阶段检索（二值向量召回 + 浮点向量精排），为空时按服务配置")
+
+
+class BatchSearchDocumentImagesParams(BaseModel):
+    queries: List[SearchDocumentImagesParams] = Field(default=[], description="检索问题列表，每个问题可指定各自的知识库和文件")
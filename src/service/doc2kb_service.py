@@ -1,35 +1,70 @@
 import asyncio
-import io
+import base64
+import multiprocessing
 import os
-import tempfile
+import shutil
+import socket
+import threading
 import time
 import traceback
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+from uuid import uuid4
 
 import fitz  # PyMuPDF
-from PIL import Image
+import numpy as np
 from fastapi import UploadFile, HTTPException
 from loguru import logger
 
 from src.config.config import settings
-from src.repositories.file_repository import create_file_data
+from src.repositories.cache_repository import (
+    select_document_cache,
+    save_document_cache,
+    select_page_cache,
+    save_page_cache
+)
+from src.models.mongo import Files
+from src.repositories.checkpoint_repository import save_page_checkpoints, select_done_pages
+from src.repositories.file_repository import (
+    claim_file_ingest,
+    create_file_data,
+    release_file_ingest,
+    renew_file_ingest,
+    select_file_data,
+    update_file_ingest_status
+)
+from src.repositories.knowledge_repository import select_knowledge_base
 from src.schemas.milvus_schemas import EmbedData
 from src.service.embed_service import embed_text
-from src.service.save_kb_service import save_kb_milvus
+from src.service.embedding_backends import embedding_model_key
+from src.service.ingest_pipeline import PipelineStage, run_pipeline
+from src.service.save_kb_service import save_kb_milvus, delete_file_pages_milvus
+from src.utils.file_spool import SpooledFile, UploadTooLargeError, spool_to_temp_file
 from src.utils.images_upload import zhipu_image_upload
-
-
-def get_embedding(image_url):
+from src.utils.page_encoder import EncodeOptions
+from src.utils.vector import as_vector
+from src.utils.pdf_render import (
+    TEXT_POLICIES,
+    TextOptions,
+    open_pdf,
+    close_pdf,
+    render_document_pages,
+    render_pdf_pages
+)
+
+
+async def get_embeddings(custom_input: List[Dict[str, str]]) -> List[np.ndarray]:
+    """批量获取向量（每个元素为 {"image": 图片地址} 或 {"text": 文本}），返回结果与输入顺序一一对应"""
     try:
-        custom_input = [
-            {"image": image_url}
-        ]
-        embedding = asyncio.run(embed_text(custom_input=custom_input))
-        return embedding[0].get("embedding")
+        embeddings = await embed_text(custom_input=custom_input)
+        if not embeddings or len(embeddings) != len(custom_input):
+            raise Exception("embedding result size mismatch")
+        return [as_vector(item.get("embedding")) for item in sorted(embeddings, key=lambda x: x.get("index"))]
     except Exception as e:
-        logger.error(f"get_embedding: {traceback.format_exc()}")
-        raise Exception(f"get embedding error image_url: {image_url}")
+        logger.error(f"get_embeddings: {traceback.format_exc()}")
+        raise Exception(f"get embedding error, batch size: {len(custom_input)}")
 
 
 def truncate_filename(filename, max_length=25):
@@ -43,9 +78,172 @@ def truncate_filename(filename, max_length=25):
     return filename
 
 
+@dataclass
+class IngestProgress:
+    """单个文件的入库进度，供异步任务查询"""
+    file_name: str
+    status: str = "pending"  # pending/running/success/partial/failed
+    file_id: str = ""
+    total_pages: int = 0
+    pages_done: int = 0
+    pages_failed: int = 0
+    error: str = ""
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed = ((self.finished_at or time.time()) - self.started_at) if self.started_at else 0
+        return {
+            "file_name": self.file_name,
+            "status": self.status,
+            "file_id": self.file_id,
+            "total_pages": self.total_pages,
+            "pages_done": self.pages_done,
+            "pages_failed": self.pages_failed,
+            "error": self.error,
+            "elapsed": round(elapsed, 2),
+            "pages_per_second": round(self.pages_done / elapsed, 2) if elapsed > 0 else 0,
+        }
+
+
+@dataclass
+class IngestContext:
+    """单个文件的入库上下文，在流水线各阶段之间共享"""
+    pdf_path: str
+    file_meta: Dict[str, Any]
+    progress: IngestProgress
+    encode_options: EncodeOptions = field(default_factory=EncodeOptions)
+    text_options: TextOptions = field(default_factory=TextOptions)
+    failed_pages: List[str] = field(default_factory=list)
+    inserted: set = field(default_factory=set)  # 所有数据都已写入向量数据库的页码（同一页可能有文本和图片两条数据）
+    pending_rows: Dict[int, int] = field(default_factory=dict)  # 页码 -> 尚未写入向量数据库的数据条数
+    render_futures: set = field(default_factory=set)  # 已提交到线程池/进程池、尚未结束的渲染任务
+    reused_pages: int = 0  # 复用缓存（跳过上传和向量化）的页数
+    text_pages: int = 0  # 使用文本层入库的页数
+    cached_hashes: Dict[int, str] = field(default_factory=dict)  # 文件级缓存命中、无需渲染的页面摘要
+    page_hashes: Dict[int, str] = field(default_factory=dict)  # 本次渲染得到的页面摘要
+    checkpoint: bool = False  # 是否记录页面级检查点
+
+    def mark_failed(self, pages: Iterable[int]) -> None:
+        """记录失败页面（同一页的多条数据失败只记录一次）"""
+        pages = list(dict.fromkeys(str(page) for page in pages if str(page) not in self.failed_pages))
+        self.failed_pages.extend(pages)
+        self.progress.pages_failed += len(pages)
+
+    @property
+    def inserted_pages(self) -> int:
+        return len(self.inserted)
+
+    def mark_inserted(self, pages: Iterable[int]) -> None:
+        """记录已写入向量数据库的页面"""
+        self.inserted.update(pages)
+        self.progress.pages_done = len(self.inserted)
+
+    def add_rows(self, pages_data: List[Dict]) -> List[Dict]:
+        """记录每页待写入的数据条数"""
+        for page in pages_data:
+            self.pending_rows[page["file_page"]] = self.pending_rows.get(page["file_page"], 0) + 1
+        return pages_data
+
+    def complete_rows(self, pages: Iterable[int]) -> List[int]:
+        """扣减已写入的数据条数，返回所有数据都已写入且没有失败数据的页码"""
+        completed = []
+        for page in pages:
+            self.pending_rows[page] -= 1
+            if self.pending_rows[page] == 0 and str(page) not in self.failed_pages:
+                completed.append(page)
+        return completed
+
+
+class FileLease:
+    """
+    文件入库租约
+
+    租约记录在文件记录上（ingest_owner/ingest_heartbeat），多个进程或副本之间互斥：
+    持有期间定期续期，进程中断后租约过期，文件可以被其他进程续传
+    """
+
+    def __init__(self, file_id: str, owner: Optional[str] = None):
+        self.file_id = file_id
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex}"
+        self._heartbeat: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """开始定期续期"""
+        self._heartbeat = asyncio.create_task(self._renew_periodically())
+
+    async def release(self) -> None:
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        await release_file_ingest(self.file_id, self.owner)
+
+    async def _renew_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(max(1, settings.INGEST_LEASE_SECONDS // 3))
+            if not await renew_file_ingest(self.file_id, self.owner):
+                logger.error(f"文件 {self.file_id} 的入库租约已失效，可能被其他进程续传")
+                return
+
+
+class PDFDocumentPool:
+    """
+    按工作线程缓存已打开的PDF文档句柄
+    同一线程处理同一文件的多个页面时只打开、解析一次，文件处理完成后统一释放
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._handles: Dict[str, List[fitz.Document]] = {}
+
+    def get(self, pdf_path: str) -> fitz.Document:
+        """获取当前线程持有的文档句柄，不存在则打开"""
+        docs = getattr(self._local, "docs", None)
+        if docs is None:
+            docs = self._local.docs = {}
+
+        # 清理已被释放的句柄
+        for path in [path for path, doc in docs.items() if doc.is_closed]:
+            del docs[path]
+
+        doc = docs.get(pdf_path)
+        if doc is None:
+            doc = open_pdf(pdf_path)
+            docs[pdf_path] = doc
+            with self._lock:
+                self._handles.setdefault(pdf_path, []).append(doc)
+        return doc
+
+    def release(self, pdf_path: str) -> None:
+        """关闭所有线程中该文件的句柄（需在该文件的页面任务全部结束后调用）"""
+        with self._lock:
+            docs = self._handles.pop(pdf_path, [])
+        for doc in docs:
+            try:
+                close_pdf(doc)
+            except Exception as e:
+                logger.warning(f"关闭PDF句柄失败: {str(e)}")
+
+
 class PDFToImageService:
     def __init__(self):
         self.executor = ThreadPoolExecutor(max_workers=settings.IMAGE_MAX_WORKERS)
+        self.upload_executor = ThreadPoolExecutor(max_workers=settings.PIPELINE_UPLOAD_CONCURRENCY)
+        self.document_pool = PDFDocumentPool()
+        self.render_mode = settings.IMAGE_RENDER_MODE
+        self._render_executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def render_executor(self) -> ProcessPoolExecutor:
+        """渲染进程池（按需创建），渲染和JPEG编码是CPU密集型任务，不受GIL限制"""
+        if self._render_executor is None:
+            self._render_executor = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_RENDER_PROCESSES or os.cpu_count(),
+                # 服务进程中有多个线程，使用spawn避免fork带来的锁状态问题
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._render_executor
 
     # 使用上下文管理器确保资源正确释放
     async def convert_pdf_to_images(
@@ -53,59 +251,136 @@ class PDFToImageService:
             pdf_file: UploadFile,
             knowledge_base_id: str,
             pages: List[int] = None
-    ) -> List[Dict[str, Any]]:
-        """将PDF文件转换为图片列表"""
+    ) -> Dict[str, Any]:
+        """将PDF文件转换为图片并流式写入知识库，返回入库统计"""
+        spooled = await self.spool_pdf(pdf_file)
+        return await self.ingest_spooled_pdf(spooled, pdf_file.filename, knowledge_base_id, pages)
 
+    async def spool_pdf(self, pdf_file: UploadFile) -> SpooledFile:
+        """校验并分块保存上传的PDF到临时文件，不把整个文件读入内存"""
         # 验证文件类型
         if not pdf_file.filename.lower().endswith('.pdf'):
             raise HTTPException(status_code=400, detail="文件必须是PDF格式")
 
-        temp_pdf_path = None
         try:
-            # 创建临时文件保存PDF
-            temp_pdf_path = self._save_temp_pdf(pdf_file)
-
+            # 文件读写放到线程中执行，避免阻塞事件循环
+            spooled = await asyncio.to_thread(spool_to_temp_file, pdf_file.file, suffix='.pdf')
+        except UploadTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        logger.info(f"上传文件已落盘，文件：{pdf_file.filename}，大小：{spooled.size}，摘要：{spooled.digest}")
+        return spooled
+
+    async def ingest_spooled_pdf(
+            self,
+            spooled: SpooledFile,
+            pdf_filename: str,
+            knowledge_base_id: str,
+            pages: List[int] = None,
+            progress: Optional[IngestProgress] = None
+    ) -> Dict[str, Any]:
+        """将已落盘的PDF写入知识库，完成后删除临时文件"""
+        try:
             # 并发处理PDF转换
-            images_data = await self._process_pdf_concurrent(
-                temp_pdf_path,
+            return await self._process_pdf_concurrent(
+                spooled.path,
                 pages,
-                pdf_file.filename,
-                knowledge_base_id
+                pdf_filename,
+                knowledge_base_id,
+                file_hash=spooled.digest,
+                progress=progress
             )
 
-            return images_data
-
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"PDF转换失败: {traceback.format_exc()}")
             raise HTTPException(status_code=500, detail=f"PDF转换失败: {str(e)}")
         finally:
             # 确保临时文件被清理
-            if temp_pdf_path and os.path.exists(temp_pdf_path):
-                self._cleanup_temp_file(temp_pdf_path)
-
-    def _save_temp_pdf(self, pdf_file: UploadFile) -> str:
-        """保存PDF到临时文件"""
-        # 使用tempfile创建临时文件，避免手动管理文件名
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp:
-            # 读取并保存PDF文件
-            content = pdf_file.file.read()
-            tmp.write(content)
-            return tmp.name
+            if spooled.path and os.path.exists(spooled.path):
+                self._cleanup_temp_file(spooled.path)
+
+    async def claim_file(self, file_id: str) -> FileLease:
+        """
+        获取文件入库租约并开始续期，文件正在其他入库流程（任意进程）中时返回 409
+
+        否则续传会删除其他进程正在写入的向量；running 但租约已过期的文件（服务中断遗留）可以获取
+        """
+        lease = FileLease(file_id)
+        if not await claim_file_ingest(file_id, lease.owner, settings.INGEST_LEASE_SECONDS):
+            raise HTTPException(status_code=409, detail="该文件正在入库或已全部入库，无法续传")
+        lease.start()
+        return lease
+
+    async def get_resumable_file(self, file_id: str) -> Files:
+        """查询可续传的文件记录，源文件已不存在时无法续传"""
+        try:
+            pdf_file = await select_file_data(file_id)
+        except Exception:
+            raise HTTPException(status_code=404, detail="文件不存在")
+        if pdf_file.ingest_status == "success":
+            raise HTTPException(status_code=400, detail="文件已全部入库，无需续传")
+        if not pdf_file.file_path or not os.path.exists(pdf_file.file_path):
+            raise HTTPException(status_code=400, detail="源文件未保留，无法续传")
+        return pdf_file
+
+    async def resume_file(self, pdf_file: Files, progress: Optional[IngestProgress] = None) -> Dict[str, Any]:
+        """
+        续传：只处理没有 done 检查点的页面（失败页面和中断时未完成的页面）
+
+        未完成页面可能已有部分向量写入但检查点未记录，先删除这些页面的向量再重新入库，避免重复
+        """
+        file_id = str(pdf_file.id)
+        try:
+            done_pages = await select_done_pages(file_id)
+            pending_pages = [page for page in range(1, (pdf_file.page_count or 0) + 1) if page not in done_pages]
+            logger.info(f"续传文件：{pdf_file.file_name}，已完成 {len(done_pages)} 页，待处理 {len(pending_pages)} 页")
+
+            if not pending_pages:
+                if progress:
+                    progress.file_id = file_id
+                await self._finish_checkpoint(pdf_file, [])
+                return {"file_id": file_id, "total_pages": 0, "inserted_pages": 0, "reused_pages": 0,
+                        "text_pages": 0, "failed_pages": []}
+
+            await delete_file_pages_milvus(file_id, pending_pages)
+            return await self._process_pdf_concurrent(
+                pdf_file.file_path,
+                pending_pages,
+                pdf_file.file_name,
+                pdf_file.knowledge_base_id,
+                file_hash=pdf_file.file_hash,
+                progress=progress,
+                pdf_file=pdf_file
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"续传失败: {traceback.format_exc()}")
+            raise HTTPException(status_code=500, detail=f"续传失败: {str(e)}")
 
     async def _process_pdf_concurrent(
             self,
             pdf_path: str,
             pages: List[int],
             pdf_filename: str,
-            knowledge_base_id: str
-    ) -> List[Dict[str, Any]]:
-        """并发处理PDF转换"""
+            knowledge_base_id: str,
+            file_hash: Optional[str] = None,
+            progress: Optional[IngestProgress] = None,
+            pdf_file: Optional[Files] = None
+    ) -> Dict[str, Any]:
+        """
+        并发处理PDF转换：render -> dedup -> upload -> embed -> insert 流式处理（EMBED_IMAGE_INPUT=base64 时先 embed 后 upload）
+
+        pdf_file 不为空时为续传，沿用已有文件记录
+        """
         start_time = time.time()
         logger.info(f"开始转换为知识库，文件：{pdf_filename}")
 
         try:
             # 一次性打开PDF文件获取所有信息
-            with fitz.open(pdf_path) as doc:
+            doc = open_pdf(pdf_path)
+            try:
                 total_pages = doc.page_count
 
                 # 确定要转换的页码
@@ -126,136 +401,440 @@ class PDFToImageService:
                             status_code=400,
                             detail=f"页码 {', '.join(invalid_pages)} 超出范围 (1-{total_pages})"
                         )
+            finally:
+                close_pdf(doc)
         except Exception as e:
             logger.error(f"打开PDF文件失败: {str(e)}")
             raise
 
-        # 记录文件信息
-        pdf_file = None
+        # 记录文件信息（首次入库时文件记录创建即持有租约，续传由调用方获取租约）
+        lease = None
+        if pdf_file is None:
+            lease = FileLease("")
+            pdf_file = await self._create_file_record(pdf_path, pdf_filename, knowledge_base_id, file_hash,
+                                                      total_pages, lease.owner)
+            if pdf_file is not None:
+                lease.file_id = str(pdf_file.id)
+                lease.start()
+            else:
+                lease = None
+
         try:
-            pdf_file = await create_file_data(
-                file_name=pdf_filename,
-                file_size=str(os.path.getsize(pdf_path)) + "（bytes）",
-                file_url="file_url",
-                file_type=os.path.splitext(pdf_filename)[1],
-                knowledge_base_id=knowledge_base_id,
-            )
-        except Exception as e:
-            logger.warning(f"记录文件数据失败: {str(e)}")
-            # 不要因为记录失败而影响主流程
+            return await self._ingest_pages(pdf_path, pages_to_convert, pdf_filename, knowledge_base_id,
+                                            file_hash, progress, pdf_file, start_time)
+        finally:
+            if lease is not None:
+                await lease.release()
 
-        # 批量提交任务，避免循环中重复创建future
-        futures = [
-            self.executor.submit(
-                self._convert_single_page,
-                pdf_path,
-                page_num,
-                pdf_filename,
-                pdf_file.id if pdf_file else "file_id",  # 需要从外部传入
-                pdf_file.file_url if pdf_file else "file_url",  # 需要从外部传入
-                knowledge_base_id,
-                settings.IMAGE_DPI
-            )
-            for page_num in pages_to_convert
+    async def _ingest_pages(
+            self,
+            pdf_path: str,
+            pages_to_convert: List[int],
+            pdf_filename: str,
+            knowledge_base_id: str,
+            file_hash: Optional[str],
+            progress: Optional[IngestProgress],
+            pdf_file: Optional[Files],
+            start_time: float
+    ) -> Dict[str, Any]:
+        """按流水线处理页面并写入向量数据库"""
+
+        progress = progress or IngestProgress(file_name=pdf_filename)
+        progress.file_id = str(pdf_file.id) if pdf_file else ""
+        progress.total_pages = len(pages_to_convert)
+
+        encode_options, text_options = await self._ingest_options(knowledge_base_id)
+        ctx = IngestContext(
+            pdf_path=pdf_path,
+            progress=progress,
+            file_meta={
+                "file_id": str(pdf_file.id if pdf_file else "file_id"),  # 需要从外部传入
+                "file_name": truncate_filename(pdf_filename),
+                "file_url": pdf_file.file_url if pdf_file else "file_url",  # 需要从外部传入
+                "knowledge_base_id": knowledge_base_id,
+            },
+            encode_options=encode_options,
+            text_options=text_options,
+            checkpoint=settings.INGEST_CHECKPOINT_ENABLED and pdf_file is not None,
+        )
+
+        # 进程模式按批次发送页码，线程模式逐页渲染（复用线程内文档句柄）
+        if self.render_mode == "process":
+            render_batch_size = max(1, settings.IMAGE_RENDER_BATCH_SIZE)
+            render_concurrency = settings.IMAGE_RENDER_PROCESSES or os.cpu_count()
+        else:
+            render_batch_size = 1
+            render_concurrency = settings.IMAGE_MAX_WORKERS
+        render_units = [
+            pages_to_convert[i:i + render_batch_size]
+            for i in range(0, len(pages_to_convert), render_batch_size)
         ]
 
-        # 收集结果并处理异常
-        images_data = []
-        failed_pages = []
+        dedup_enabled = settings.INGEST_DEDUP_ENABLED
+        # 文件级缓存只记录图片摘要，使用文本层时不能据此跳过页面
+        doc_cache_enabled = dedup_enabled and file_hash and text_options.policy == "image"
+        if doc_cache_enabled:
+            ctx.cached_hashes = await self._load_document_cache(file_hash, pages_to_convert, ctx.encode_options)
 
-        for future in as_completed(futures):
-            try:
-                result = future.result()
-                images_data.append(result)
-            except Exception as e:
-                # 记录失败页面但继续处理其他页面
-                logger.error(f"页面转换失败: {str(e)}")
-                failed_pages.append(str(futures.index(future) + 1))
+        batch_wait = settings.PIPELINE_BATCH_WAIT_MS / 1000
+        stages = [
+            PipelineStage("render", partial(self._render_stage, ctx), concurrency=render_concurrency),
+        ]
+        if dedup_enabled:
+            stages.append(PipelineStage("dedup", partial(self._dedup_stage, ctx),
+                                        batch_size=settings.EMBED_BATCH_SIZE, batch_wait=batch_wait))
+        upload_stage = PipelineStage("upload", partial(self._upload_stage, ctx),
+                                     concurrency=settings.PIPELINE_UPLOAD_CONCURRENCY)
+        embed_stage = PipelineStage("embed", partial(self._embed_stage, ctx),
+                                    concurrency=settings.EMBED_MAX_CONCURRENCY, batch_size=settings.EMBED_BATCH_SIZE,
+                                    batch_wait=batch_wait)
+        # base64 模式下向量化不依赖图片地址，上传移到向量化之后，与后续批次的向量化并行
+        stages += [embed_stage, upload_stage] if self._embed_base64 else [upload_stage, embed_stage]
+        stages.append(PipelineStage("insert", partial(self._insert_stage, ctx),
+                                    batch_size=settings.PIPELINE_INSERT_BATCH_SIZE, batch_wait=batch_wait))
 
-        # 如果有页面失败，记录日志但不中断流程
-        if failed_pages:
-            logger.warning(f"以下页码转换失败: {', '.join(failed_pages)}")
+        try:
+            await run_pipeline(render_units, stages, queue_size=settings.PIPELINE_QUEUE_SIZE)
+        finally:
+            # 流水线取消或出错时不会等待已在执行的渲染，先等它们结束，
+            # 再释放各线程持有的文档句柄（渲染中关闭文档会解除内存映射，导致进程崩溃）
+            if ctx.render_futures:
+                await asyncio.gather(
+                    *(asyncio.wrap_future(future) for future in list(ctx.render_futures)),
+                    return_exceptions=True
+                )
+            self.document_pool.release(pdf_path)
+
+        if doc_cache_enabled:
+            await save_document_cache(file_hash, ctx.encode_options.key(), ctx.page_hashes)
+
+        if ctx.checkpoint:
+            await self._finish_checkpoint(pdf_file, [int(page) for page in ctx.failed_pages])
 
-        # 按页码排序
-        # images_data.sort(key=lambda x: x.get("file_page", 0))
+        # 如果有页面失败，记录日志但不中断流程
+        if ctx.failed_pages:
+            logger.warning(f"以下页码转换失败: {', '.join(ctx.failed_pages)}")
 
         end_time = time.time()
         logger.info(
             f"知识库转换完成，文件：{pdf_filename}，"
-            f"总页数：{len(images_data)}，"
-            f"失败页数：{len(failed_pages)}，"
+            f"入库页数：{ctx.inserted_pages}，"
+            f"复用页数：{ctx.reused_pages}，"
+            f"文本层页数：{ctx.text_pages}，"
+            f"失败页数：{len(ctx.failed_pages)}，"
             f"处理时间：{end_time - start_time:.2f}秒"
         )
-        try:
-            await save_kb_milvus(images_data)
-        except Exception as e:
-            logger.error(f"保存到向量数据库失败: {str(e)} {traceback.format_exc()}")
 
-        return images_data
+        return {
+            "file_id": ctx.file_meta["file_id"],
+            "total_pages": len(pages_to_convert),
+            "inserted_pages": ctx.inserted_pages,
+            "reused_pages": ctx.reused_pages,
+            "text_pages": ctx.text_pages,
+            "failed_pages": ctx.failed_pages,
+        }
 
-    def _convert_single_page(
+    async def _create_file_record(
             self,
             pdf_path: str,
-            page_num: int,
             pdf_filename: str,
-            pdf_id: str,
-            pdf_url: str,
-            kb_id: str,
-            dpi: int = settings.IMAGE_DPI,
-    ) -> Dict:
-        """转换单个PDF页面为图片"""
+            knowledge_base_id: str,
+            file_hash: Optional[str],
+            total_pages: int,
+            ingest_owner: str = ""
+    ) -> Optional[Files]:
+        """记录文件信息，启用检查点时同时保留一份源文件用于续传"""
+        stored_path = ""
+        if settings.INGEST_CHECKPOINT_ENABLED:
+            try:
+                stored_path = await asyncio.to_thread(self._store_source_pdf, pdf_path)
+            except Exception as e:
+                logger.warning(f"保留源文件失败，该文件无法续传: {str(e)}")
+
+        try:
+            return await create_file_data(
+                file_name=pdf_filename,
+                file_size=str(os.path.getsize(pdf_path)) + "（bytes）",
+                file_url="file_url",
+                file_type=os.path.splitext(pdf_filename)[1],
+                knowledge_base_id=knowledge_base_id,
+                file_hash=file_hash or "",
+                file_path=stored_path,
+                page_count=total_pages,
+                ingest_owner=ingest_owner,
+            )
+        except Exception as e:
+            logger.warning(f"记录文件数据失败: {str(e)}")
+            # 不要因为记录失败而影响主流程
+            if stored_path:
+                self._cleanup_temp_file(stored_path)
+            return None
+
+    @staticmethod
+    def _store_source_pdf(pdf_path: str) -> str:
+        """把源文件保存到 INGEST_STORAGE_DIR（同一文件系统时使用硬链接），返回保存路径"""
+        os.makedirs(settings.INGEST_STORAGE_DIR, exist_ok=True)
+        stored_path = os.path.abspath(os.path.join(settings.INGEST_STORAGE_DIR, f"{uuid4().hex}.pdf"))
         try:
-            # 使用上下文管理器确保PDF文件正确关闭
-            with fitz.open(pdf_path) as doc:
-                page = doc.load_page(page_num - 1)
+            os.link(pdf_path, stored_path)
+        except OSError:
+            shutil.copyfile(pdf_path, stored_path)
+        return stored_path
+
+    async def _finish_checkpoint(self, pdf_file: Files, failed_pages: List[int]) -> None:
+        """记录失败页面检查点并更新文件状态；全部完成时删除保留的源文件"""
+        file_id = str(pdf_file.id)
+        try:
+            await save_page_checkpoints(file_id, failed_pages, "failed")
+        except Exception as e:
+            logger.warning(f"记录失败页面检查点失败: {str(e)}")
 
-                # 计算缩放比例
-                zoom = dpi / 72
-                mat = fitz.Matrix(zoom, zoom)
+        if failed_pages:
+            await update_file_ingest_status(file_id, "partial")
+            logger.info(f"文件 {pdf_file.file_name} 部分页面失败，可通过 file_id={file_id} 续传")
+            return
+
+        if pdf_file.file_path:
+            self._cleanup_temp_file(pdf_file.file_path)
+        await update_file_ingest_status(file_id, "success", file_path="")
+
+    @staticmethod
+    def default_encode_options() -> EncodeOptions:
+        """全局默认的页面渲染与编码参数"""
+        return EncodeOptions(
+            format=settings.IMAGE_FORMAT,
+            engine=settings.IMAGE_ENCODER,
+            dpi=settings.IMAGE_DPI,
+            quality=settings.IMAGE_QUALITY,
+            chroma_subsampling=settings.IMAGE_CHROMA_SUBSAMPLING,
+            max_pixels=settings.IMAGE_MAX_PIXELS,
+        )
 
-                # 直接渲染为Pixmap，避免中间转换
-                pix = page.get_pixmap(matrix=mat, alpha=False, dpi=dpi)
+    async def _ingest_options(self, knowledge_base_id: str) -> Tuple[EncodeOptions, TextOptions]:
+        """知识库配置了 image_options / text_policy 时覆盖全局默认参数"""
+        options = self.default_encode_options()
+        text_policy = settings.INGEST_TEXT_POLICY
+        knowledge_base = await select_knowledge_base(knowledge_base_id)
+        if knowledge_base:
+            if knowledge_base.image_options:
+                try:
+                    options = options.merge(knowledge_base.image_options)
+                except Exception as e:
+                    logger.warning(f"知识库 {knowledge_base_id} 图片参数无效，使用默认参数: {str(e)}")
+            if knowledge_base.text_policy in TEXT_POLICIES:
+                text_policy = knowledge_base.text_policy
+
+        text_options = TextOptions(
+            policy=text_policy,
+            min_chars=settings.INGEST_TEXT_MIN_CHARS,
+            max_chars=settings.INGEST_TEXT_MAX_CHARS,
+        )
+        return options, text_options
+
+    async def _load_document_cache(self, file_hash: str, pages: List[int], options: EncodeOptions) -> Dict[int, str]:
+        """查询文件级缓存，返回无需重新渲染的 页码 -> 页面摘要"""
+        doc_cache = await select_document_cache(file_hash, options.key())
+        if not doc_cache or not doc_cache.page_hashes:
+            return {}
+
+        wanted = set(pages)
+        page_hashes = {
+            int(page): page_hash
+            for page, page_hash in doc_cache.page_hashes.items()
+            if int(page) in wanted
+        }
+        # 只保留页面缓存仍然存在的页
+        existing = await select_page_cache(list(page_hashes.values()), embedding_model_key(), only_hash=True)
+        cached_hashes = {page: page_hash for page, page_hash in page_hashes.items() if page_hash in existing}
+        logger.info(f"文件级缓存命中 {len(cached_hashes)} 页，摘要：{file_hash}")
+        return cached_hashes
+
+    async def _render_stage(self, ctx: IngestContext, page_nums: List[int]) -> List[Dict]:
+        """渲染阶段：输出页面图片、尺寸和图片摘要；文件级缓存命中的页面只输出摘要，不再渲染"""
+        pages_data = [
+            {"file_page": page, "page_hash": ctx.cached_hashes[page]}
+            for page in page_nums if page in ctx.cached_hashes
+        ]
+        page_nums = [page for page in page_nums if page not in ctx.cached_hashes]
+        if not page_nums:
+            return ctx.add_rows(pages_data)
 
-                # 直接保存为JPEG格式，避免PIL转换
-                img_byte_arr = io.BytesIO()
+        try:
+            if self.render_mode == "process":
+                future = self.render_executor.submit(
+                    render_pdf_pages, ctx.pdf_path, page_nums, ctx.encode_options, ctx.text_options
+                )
+            else:
+                future = self.executor.submit(
+                    self._render_pages, ctx.pdf_path, page_nums, ctx.encode_options, ctx.text_options
+                )
+            ctx.render_futures.add(future)
+            future.add_done_callback(ctx.render_futures.discard)
+            rendered_pages = await asyncio.wrap_future(future)
+        except Exception as e:
+            # 整批失败（如子进程异常退出）
+            logger.error(f"页面渲染失败: {str(e)}")
+            ctx.mark_failed(page_nums)
+            return ctx.add_rows(pages_data)
+
+        for rendered in rendered_pages:
+            if "error" in rendered:
+                logger.error(f"转换第 {rendered['page']} 页失败: {rendered['error']}")
+                ctx.mark_failed([rendered["page"]])
+                continue
+            if "text" in rendered:
+                ctx.text_pages += 1
+                pages_data.append({
+                    "file_page": rendered["page"],
+                    "page_text": rendered["text"],
+                    "image_width": rendered["width"],
+                    "image_height": rendered["height"],
+                })
+                continue
+            ctx.page_hashes[rendered["page"]] = rendered["hash"]
+            pages_data.append({
+                "file_page": rendered["page"],
+                "image": rendered["image"],
+                "image_type": ctx.encode_options.extension,
+                "image_width": rendered["width"],
+                "image_height": rendered["height"],
+                "page_hash": rendered["hash"],
+            })
+        # 同一页的所有数据在这里一次性计数，早于其中任何一条到达入库阶段
+        return ctx.add_rows(pages_data)
+
+    async def _dedup_stage(self, ctx: IngestContext, batch: List[Dict]) -> List[Dict]:
+        """去重阶段：按页面图片摘要查找处理过的页面，复用图片地址和向量，跳过上传和向量化（文本页直接通过）"""
+        caches = await select_page_cache(
+            [page["page_hash"] for page in batch if "page_hash" in page], embedding_model_key()
+        )
 
-                # 检查是否需要使用PIL进行额外处理
-                if hasattr(pix, 'pil_save'):
-                    # 如果有pil_save方法，直接使用
-                    pil_image = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                    pil_image.save(img_byte_arr, format='JPEG', quality=95)
-                else:
-                    # 否则使用默认方式
-                    pil_image = Image.open(io.BytesIO(pix.tobytes("ppm")))
-                    pil_image.save(img_byte_arr, format='JPEG', quality=95)
-
-                img_bytes = img_byte_arr.getvalue()
-
-                # 图片上传和向量化（考虑是否需要异步处理）
-                upload_result = zhipu_image_upload(img_bytes)
-                if not upload_result or 'result' not in upload_result:
-                    raise Exception("图片上传失败")
-
-                image_url = upload_result['result'].get('file_url')
-
-                # 获取向量嵌入
-                embedding = get_embedding(image_url)
-
-                return EmbedData(
-                    embedding=embedding,
-                    image_url=image_url,
-                    image_width=pix.width,
-                    image_height=pix.height,
-                    file_id=str(pdf_id),
-                    file_name=truncate_filename(pdf_filename),
-                    file_page=page_num,
-                    file_url=pdf_url,
-                    knowledge_base_id=kb_id
-                ).to_dict()
+        pages_data = []
+        for page in batch:
+            if "page_hash" not in page:
+                pages_data.append(page)
+                continue
+            cache = caches.get(page["page_hash"])
+            if cache:
+                page.pop("image", None)
+                page.update(
+                    image_url=cache.image_url,
+                    image_width=cache.image_width,
+                    image_height=cache.image_height,
+                    embedding=as_vector(cache.embedding),
+                )
+                ctx.reused_pages += 1
+            elif "image" not in page:
+                # 文件级缓存命中但页面缓存已被删除
+                logger.error(f"第 {page['file_page']} 页缓存不存在")
+                ctx.mark_failed([page["file_page"]])
+                continue
+            pages_data.append(page)
+        return pages_data
+
+    async def _upload_stage(self, ctx: IngestContext, page: Dict) -> List[Dict]:
+        """上传阶段：上传页面图片，已有图片地址的页面和文本页直接跳过"""
+        if page.get("image_url") or "image" not in page:
+            return [page]
+        try:
+            page["image_url"] = await asyncio.get_running_loop().run_in_executor(
+                self.upload_executor,
+                self._upload_page,
+                page.pop("image"),
+                page["file_page"],
+                page.pop("image_type")
+            )
+            return [page]
+        except Exception as e:
+            logger.error(f"页面上传失败: {str(e)}")
+            ctx.mark_failed([page["file_page"]])
+            return []
+
+    @property
+    def _embed_base64(self) -> bool:
+        return settings.EMBED_IMAGE_INPUT == "base64"
+
+    def _embed_input(self, page: Dict) -> Dict[str, str]:
+        """页面的向量化输入：文本页为文本，图片页为图片地址（base64 模式下为图片数据）"""
+        if "page_text" in page:
+            return {"text": page["page_text"]}
+        if self._embed_base64 and "image" in page:
+            return {"image": base64.b64encode(page["image"]).decode("ascii")}
+        return {"image": page["image_url"]}
+
+    async def _embed_stage(self, ctx: IngestContext, batch: List[Dict]) -> List[Dict]:
+        """向量化阶段：按批次获取页面向量，已有向量的页面直接跳过"""
+        pending = [page for page in batch if "embedding" not in page]
+        if not pending:
+            return batch
 
+        try:
+            embeddings = await get_embeddings([self._embed_input(page) for page in pending])
+        except Exception as e:
+            logger.error(f"批量向量化失败: {str(e)}")
+            ctx.mark_failed(page["file_page"] for page in pending)
+            return [page for page in batch if "embedding" in page]
+
+        for page, embedding in zip(pending, embeddings):
+            page["embedding"] = embedding
+            # 图片页在拿到图片地址后（入库阶段）写入页面缓存
+            page["cacheable"] = "page_hash" in page
+        return batch
+
+    async def _insert_stage(self, ctx: IngestContext, batch: List[Dict]) -> List[Any]:
+        """入库阶段：写入页面缓存，批量写入向量数据库"""
+        cacheable = [page for page in batch if page.pop("cacheable", False)]
+        if settings.INGEST_DEDUP_ENABLED and cacheable:
+            await save_page_cache(cacheable, embedding_model_key())
+
+        batch = [
+            EmbedData(
+                embedding=page["embedding"],
+                image_url=page.get("image_url", ""),
+                page_text=page.get("page_text"),
+                image_width=page["image_width"],
+                image_height=page["image_height"],
+                file_page=page["file_page"],
+                **ctx.file_meta
+            ).to_dict()
+            for page in batch
+        ]
+        try:
+            await save_kb_milvus(batch)
         except Exception as e:
-            logger.error(f"转换第 {page_num} 页失败: {str(e)}")
-            raise Exception(f"转换第 {page_num} 页失败: {str(e)}")
+            logger.error(f"保存到向量数据库失败: {str(e)} {traceback.format_exc()}")
+            ctx.mark_failed(item["file_page"] for item in batch)
+            return []
+
+        # 同一页的文本和图片数据可能分批写入，全部写入后才计入进度并记录 done 检查点
+        done_pages = ctx.complete_rows(item["file_page"] for item in batch)
+        ctx.mark_inserted(done_pages)
+        if ctx.checkpoint and done_pages:
+            try:
+                await save_page_checkpoints(ctx.file_meta["file_id"], done_pages, "done")
+            except Exception as e:
+                # 检查点缺失的页面续传时会先删除向量再重新入库，不会重复
+                logger.warning(f"记录页面检查点失败: {str(e)}")
+        return []
+
+    def _render_pages(
+            self,
+            pdf_path: str,
+            page_nums: List[int],
+            options: EncodeOptions,
+            text_options: TextOptions
+    ) -> List[Dict]:
+        """在线程中渲染页面"""
+        # 复用当前线程已打开的文档句柄，避免每页重复解析xref和页面树
+        doc = self.document_pool.get(pdf_path)
+        return render_document_pages(doc, page_nums, options, text_options)
+
+    def _upload_page(self, img_bytes: bytes, page_num: int, image_type: str = "jpg") -> str:
+        """上传页面图片，返回图片地址"""
+        upload_result = zhipu_image_upload(img_bytes, file_type=image_type)
+        if not upload_result or 'result' not in upload_result:
+            raise Exception(f"第 {page_num} 页图片上传失败")
+        return upload_result['result'].get('file_url')
 
     def _cleanup_temp_file(self, file_path: str):
         """清理临时文件"""
@@ -280,5 +859,8 @@ class PDFToImageService:
         # 注意：PDF临时文件已经在转换完成后立即清理
 
     def shutdown(self):
-        """关闭线程池"""
+        """关闭线程池和渲染进程池"""
         self.executor.shutdown(wait=True)
+        self.upload_executor.shutdown(wait=True)
+        if self._render_executor is not None:
+            self._render_executor.shutdown(wait=True)
@@ -1,19 +1,170 @@
 import asyncio
 import time
-from typing import Optional
+from typing import Dict, List, Optional, Set, Tuple
 
+import numpy as np
 from loguru import logger
 
-from src.third_party_service.jina import get_embeddings_async
+from src.config.config import settings
+from src.service.embedding_cache import cache_key, get_embedding_cache
+from src.service.embedding_backends import embedding_model_key, get_embedding_backend
+from src.third_party_service.jina import EmbeddingError
+from src.utils.vector import truncate_vector
 
 
 async def embed_text(custom_input: Optional[list] = None):
     start_time = time.time()
-    embed_data = await get_embeddings_async(custom_input=custom_input)
-    logger.info(f"get embeddings : {time.time() - start_time}")
+    backend = get_embedding_backend()
+    embed_data = await backend.embed(custom_input)
+    # 服务端未按配置维度返回时在本地截断
+    for item in embed_data:
+        if len(item["embedding"]) < settings.EMBED_DIMENSION:
+            raise EmbeddingError(f"向量维度 {len(item['embedding'])} 小于 EMBED_DIMENSION={settings.EMBED_DIMENSION}")
+        item["embedding"] = truncate_vector(item["embedding"], settings.EMBED_DIMENSION)
+    logger.info(f"get embeddings ({backend.model_name}) : {time.time() - start_time}")
     return embed_data
 
 
+class EmbeddingBatcher:
+    """
+    向量化请求微批合并
+
+    并发到达的单条请求先进入等待队列，等待 max_wait 秒或凑满 max_batch_size 条后合并为一次向量化调用，
+    结果按顺序分发给各自的调用方
+    """
+
+    def __init__(self, max_batch_size: int, max_wait: float):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait
+        self._pending: List[Tuple[Dict[str, str], asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def embed(self, item: Dict[str, str]) -> np.ndarray:
+        """获取单条输入（{"text": ...} 或 {"image": ...}）的向量"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.get_running_loop().create_task(self._send(batch))
+        # 保留任务引用，避免执行中被回收
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    async def _send(batch: List[Tuple[Dict[str, str], asyncio.Future]]) -> None:
+        # 调用方已取消的请求不再发送
+        batch = [(item, future) for item, future in batch if not future.done()]
+        if not batch:
+            return
+        try:
+            results = await embed_text(custom_input=[item for item, _ in batch])
+            if not results or len(results) != len(batch):
+                raise Exception("embedding result size mismatch")
+            results = sorted(results, key=lambda x: x.get("index"))
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result.get("embedding"))
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        logger.debug(f"embedding batch size: {len(batch)}")
+
+
+_embedding_batcher: Optional[EmbeddingBatcher] = None
+
+
+def get_embedding_batcher() -> EmbeddingBatcher:
+    global _embedding_batcher
+    if _embedding_batcher is None:
+        _embedding_batcher = EmbeddingBatcher(
+            max_batch_size=settings.EMBED_QUERY_BATCH_SIZE,
+            max_wait=settings.EMBED_QUERY_BATCH_WAIT_MS / 1000,
+        )
+    return _embedding_batcher
+
+
+_inflight_queries: Dict[str, asyncio.Task] = {}
+
+
+async def embed_query(text: str) -> np.ndarray:
+    """获取检索问题的向量：优先读取缓存，相同问题并发未命中时只请求一次"""
+    if not settings.EMBED_CACHE_ENABLED:
+        return await _embed_query(text)
+
+    cache = get_embedding_cache()
+    key = cache_key(embedding_model_key(), settings.EMBED_TASK, {"text": text})
+    embedding = await cache.get(key)
+    if embedding is not None:
+        return embedding
+
+    task = _inflight_queries.get(key)
+    if task is None:
+        task = asyncio.create_task(_embed_and_cache(key, text))
+        _inflight_queries[key] = task
+        task.add_done_callback(lambda _: _inflight_queries.pop(key, None))
+    # 单个调用方取消时不影响其他等待同一结果的调用方
+    return await asyncio.shield(task)
+
+
+async def embed_queries(texts: List[str]) -> List[np.ndarray]:
+    """批量获取检索问题的向量：重复问题只计算一次，缓存未命中的问题合并为一次向量化请求，结果与输入顺序一致"""
+    unique_texts = list(dict.fromkeys(texts))
+    vectors: Dict[str, np.ndarray] = {}
+    keys: Dict[str, str] = {}
+
+    if settings.EMBED_CACHE_ENABLED:
+        cache = get_embedding_cache()
+        for text in unique_texts:
+            keys[text] = cache_key(embedding_model_key(), settings.EMBED_TASK, {"text": text})
+            embedding = await cache.get(keys[text])
+            if embedding is not None:
+                vectors[text] = embedding
+
+    missing = [text for text in unique_texts if text not in vectors]
+    if missing:
+        results = await embed_text(custom_input=[{"text": text} for text in missing])
+        if not results or len(results) != len(missing):
+            raise Exception("embedding result size mismatch")
+        for text, result in zip(missing, sorted(results, key=lambda x: x.get("index"))):
+            vectors[text] = result.get("embedding")
+            if settings.EMBED_CACHE_ENABLED:
+                await get_embedding_cache().set(keys[text], vectors[text])
+
+    return [vectors[text] for text in texts]
+
+
+async def _embed_and_cache(key: str, text: str) -> np.ndarray:
+    embedding = await _embed_query(text)
+    await get_embedding_cache().set(key, embedding)
+    return embedding
+
+
+async def _embed_query(text: str) -> np.ndarray:
+    """开启微批合并时与并发请求合并发送"""
+    if settings.EMBED_QUERY_BATCH_ENABLED:
+        return await get_embedding_batcher().embed({"text": text})
+
+    embedding = await embed_text(custom_input=[{"text": text}])
+    if not embedding:
+        raise Exception("embedding result is empty")
+    return embedding[0].get("embedding")
+
+
 async def main():
     print("=== 异步方法示例 ===")
 
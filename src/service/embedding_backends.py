@@ -0,0 +1,188 @@
+"""
+向量化后端
+
+embed_service.embed_text 通过 EMBED_BACKEND 选择的后端获取向量：
+jina 为 HTTP 服务，local 为进程池中的本地 CPU 模型，fake 为按输入哈希生成的确定性向量（测试、压测用，不访问网络）
+"""
+import asyncio
+import hashlib
+import multiprocessing
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.config.config import settings
+from src.third_party_service.jina import EmbeddingError, get_embeddings_async
+from src.utils.local_embedding import encode_inputs, model_dimension
+from src.utils.vector import VECTOR_DTYPE, as_vector, l2_normalize
+
+
+def _build_results(custom_input: List[Dict[str, str]], embeddings: List[np.ndarray]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "index": i,
+            "image_or_text": item.get("image") or item.get("text"),
+            "embedding": as_vector(embedding),
+        }
+        for i, (item, embedding) in enumerate(zip(custom_input, embeddings))
+    ]
+
+
+def _validate_input(custom_input: Optional[List[Dict[str, str]]]) -> None:
+    if not custom_input:
+        raise EmbeddingError("输入数据为空")
+    for item in custom_input:
+        if not isinstance(item, dict) or ("text" not in item and "image" not in item):
+            raise EmbeddingError("输入数据格式不正确，每个元素必须是包含'text'或'image'的字典")
+
+
+class EmbeddingBackend(ABC):
+    """向量化后端抽象基类"""
+
+    model_name: str = ""
+
+    @abstractmethod
+    async def embed(self, custom_input: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        """
+        获取一批输入的向量
+
+        Returns:
+            与输入顺序一致的字典列表，每个字典包含 index/image_or_text/embedding
+
+        Raises:
+            EmbeddingError: 获取失败
+        """
+        pass
+
+    async def start(self) -> None:
+        """启动时检查后端配置，配置错误时抛出异常"""
+        pass
+
+    def close(self) -> None:
+        """释放后端资源"""
+        pass
+
+
+class JinaEmbeddingBackend(EmbeddingBackend):
+    """Jina HTTP 向量化服务"""
+
+    def __init__(self):
+        self.model_name = settings.EMBED_MODEL_NAME
+
+    async def embed(self, custom_input: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        return await get_embeddings_async(custom_input=custom_input)
+
+
+class LocalEmbeddingBackend(EmbeddingBackend):
+    """本地 CPU 模型，在进程池中计算，不阻塞事件循环"""
+
+    def __init__(self):
+        self.model_name = settings.EMBED_LOCAL_MODEL
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=settings.EMBED_LOCAL_PROCESSES or 1,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    async def start(self) -> None:
+        """加载模型并检查输出维度，维度小于 EMBED_DIMENSION 时无法入库"""
+        dimension = await asyncio.wrap_future(self.executor.submit(model_dimension, self.model_name))
+        if dimension < settings.EMBED_DIMENSION:
+            raise ValueError(
+                f"Local model {self.model_name} outputs {dimension}-dim vectors but EMBED_DIMENSION is "
+                f"{settings.EMBED_DIMENSION}; set EMBED_DIMENSION={dimension} and use "
+                f"init/migrate_milvus_collection.py to build a collection with that dimension"
+            )
+
+    async def embed(self, custom_input: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        _validate_input(custom_input)
+        try:
+            embeddings = await asyncio.wrap_future(
+                self.executor.submit(encode_inputs, self.model_name, custom_input)
+            )
+        except Exception as e:
+            raise EmbeddingError(f"本地模型向量化失败: {str(e)}") from e
+        return _build_results(custom_input, embeddings)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+class FakeEmbeddingBackend(EmbeddingBackend):
+    """按输入内容哈希生成确定性的单位向量，相同输入得到相同向量"""
+
+    def __init__(self):
+        self.model_name = "fake"
+        self.dim = settings.EMBED_DIMENSION
+
+    def _vector(self, item: Dict[str, str]) -> np.ndarray:
+        value = item.get("text") if "text" in item else item.get("image")
+        seed = hashlib.sha256(f"{self.model_name}\x1f{value}".encode("utf-8")).digest()
+        rng = np.random.default_rng(int.from_bytes(seed, "big"))
+        return l2_normalize(rng.standard_normal(self.dim, dtype=VECTOR_DTYPE))
+
+    async def embed(self, custom_input: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        _validate_input(custom_input)
+        return _build_results(custom_input, [self._vector(item) for item in custom_input])
+
+
+class EmbeddingBackendFactory:
+    """向量化后端工厂类"""
+
+    _backends = {
+        'jina': JinaEmbeddingBackend,
+        'local': LocalEmbeddingBackend,
+        'fake': FakeEmbeddingBackend,
+    }
+
+    @classmethod
+    def create_backend(cls, backend_type: str, **kwargs) -> EmbeddingBackend:
+        """创建向量化后端实例"""
+        if backend_type not in cls._backends:
+            raise ValueError(f"Unknown embedding backend: {backend_type}")
+
+        backend_class = cls._backends[backend_type]
+        return backend_class(**kwargs)
+
+    @classmethod
+    def register_backend(cls, name: str, backend_class: type):
+        """注册新的向量化后端类型"""
+        if not issubclass(backend_class, EmbeddingBackend):
+            raise TypeError("Backend class must be a subclass of EmbeddingBackend")
+        cls._backends[name] = backend_class
+
+
+_embedding_backend: Optional[EmbeddingBackend] = None
+
+
+def get_embedding_backend() -> EmbeddingBackend:
+    global _embedding_backend
+    if _embedding_backend is None:
+        _embedding_backend = EmbeddingBackendFactory.create_backend(settings.EMBED_BACKEND)
+    return _embedding_backend
+
+
+async def init_embedding_backend() -> None:
+    """创建向量化后端并检查配置"""
+    await get_embedding_backend().start()
+
+
+def embedding_model_key() -> str:
+    """向量缓存使用的模型标识（模型名 + 维度），切换模型或维度后不会读到旧向量"""
+    return f"{get_embedding_backend().model_name}@{settings.EMBED_DIMENSION}"
+
+
+def close_embedding_backend() -> None:
+    global _embedding_backend
+    if _embedding_backend is not None:
+        _embedding_backend.close()
+        _embedding_backend = None
@@ -0,0 +1,170 @@
+"""
+检索问题向量缓存
+
+内存中按 LRU 淘汰、按 TTL 过期；可选 sqlite 本地存储，服务重启后缓存仍然有效
+"""
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from src.config.config import settings
+from src.utils.vector import as_vector
+
+
+def normalize_text(text: str) -> str:
+    """统一全角/半角等 Unicode 写法，合并空白字符"""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def cache_key(model: str, task: str, item: Dict[str, str]) -> str:
+    """按模型、任务和归一化后的输入生成缓存键"""
+    kind, value = ("text", normalize_text(item["text"])) if "text" in item else ("image", item["image"])
+    raw = "\x1f".join([model, task, kind, value])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class DiskEmbeddingStore:
+    """sqlite 向量存储（float32），所有方法都是同步的，需在线程中调用"""
+
+    def __init__(self, path: str, ttl: float):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embedding_cache "
+            "(key TEXT PRIMARY KEY, embedding BLOB NOT NULL, created_at REAL NOT NULL)"
+        )
+        # 清理已过期的数据
+        self._conn.execute("DELETE FROM embedding_cache WHERE created_at < ?", (time.time() - ttl,))
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[np.ndarray, float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT embedding, created_at FROM embedding_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if not row or row[1] < time.time() - self.ttl:
+            return None
+        return as_vector(row[0]), row[1]
+
+    def set(self, key: str, embedding: np.ndarray, created_at: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO embedding_cache (key, embedding, created_at) VALUES (?, ?, ?)",
+                (key, as_vector(embedding).tobytes(), created_at)
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class EmbeddingCache:
+    """向量缓存：内存 LRU + TTL，可选本地存储"""
+
+    def __init__(self, max_size: int, ttl: float, disk_path: str = ""):
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        self._memory: "OrderedDict[str, Tuple[np.ndarray, float]]" = OrderedDict()
+        self._disk: Optional[DiskEmbeddingStore] = None
+        if disk_path:
+            try:
+                self._disk = DiskEmbeddingStore(disk_path, ttl)
+            except Exception as e:
+                logger.warning(f"向量缓存本地存储不可用，仅使用内存缓存: {str(e)}")
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def get(self, key: str) -> Optional[np.ndarray]:
+        entry = self._memory.get(key)
+        if entry is not None:
+            if entry[1] >= time.time() - self.ttl:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            del self._memory[key]
+
+        if self._disk is not None:
+            try:
+                entry = await asyncio.to_thread(self._disk.get, key)
+            except Exception as e:
+                logger.warning(f"读取向量缓存失败: {str(e)}")
+                entry = None
+            if entry is not None:
+                self._put_memory(key, entry)
+                self.hits += 1
+                self.disk_hits += 1
+                return entry[0]
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, embedding: np.ndarray) -> None:
+        entry = (as_vector(embedding), time.time())
+        self._put_memory(key, entry)
+        if self._disk is not None:
+            try:
+                await asyncio.to_thread(self._disk.set, key, *entry)
+            except Exception as e:
+                logger.warning(f"写入向量缓存失败: {str(e)}")
+
+    def _put_memory(self, key: str, entry: Tuple[np.ndarray, float]) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._memory),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "disk": self._disk is not None,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0,
+        }
+
+    def close(self) -> None:
+        if self._disk is not None:
+            self._disk.close()
+            self._disk = None
+
+
+_embedding_cache: Optional[EmbeddingCache] = None
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    global _embedding_cache
+    if _embedding_cache is None:
+        _embedding_cache = EmbeddingCache(
+            max_size=settings.EMBED_CACHE_MAX_SIZE,
+            ttl=settings.EMBED_CACHE_TTL,
+            disk_path=settings.EMBED_CACHE_DISK_PATH,
+        )
+    return _embedding_cache
+
+
+def close_embedding_cache() -> None:
+    global _embedding_cache
+    if _embedding_cache is not None:
+        _embedding_cache.close()
+        _embedding_cache = None
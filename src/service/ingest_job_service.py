@@ -0,0 +1,217 @@
+import asyncio
+import os
+import time
+import traceback
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import UploadFile
+from loguru import logger
+
+from src.config.config import settings
+from src.repositories.ingest_job_repository import create_ingest_job, update_ingest_job, select_ingest_job
+from src.service.doc2kb_service import IngestProgress, PDFToImageService
+from src.utils.file_spool import SpooledFile
+
+
+@dataclass
+class IngestJobState:
+    """运行中任务的内存状态"""
+    knowledge_base_id: str
+    files: List[IngestProgress]
+    status: str = "pending"
+
+
+def summarize_job(job_id: str, knowledge_base_id: str, status: str, files: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """汇总任务进度"""
+    pages_done = sum(f.get("pages_done", 0) for f in files)
+    elapsed = max([f.get("elapsed", 0) for f in files] or [0])
+    return {
+        "job_id": job_id,
+        "knowledge_base_id": knowledge_base_id,
+        "status": status,
+        "total_pages": sum(f.get("total_pages", 0) for f in files),
+        "pages_done": pages_done,
+        "pages_failed": sum(f.get("pages_failed", 0) for f in files),
+        "elapsed": elapsed,
+        "pages_per_second": round(pages_done / elapsed, 2) if elapsed > 0 else 0,
+        "files": files,
+    }
+
+
+class IngestJobManager:
+    """
+    异步入库任务管理
+
+    请求只负责把上传文件落盘并登记任务，入库在后台执行，不受请求生命周期影响；
+    同时运行的任务数受 INGEST_JOB_CONCURRENCY 限制，任务内同时入库的文件数受 INGEST_JOB_FILE_CONCURRENCY 限制，
+    进度在内存中实时更新并定期写入 MongoDB
+    """
+
+    def __init__(self, pdf_service: PDFToImageService):
+        self.pdf_service = pdf_service
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._jobs: Dict[str, IngestJobState] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # 在事件循环中按需创建
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(max(1, settings.INGEST_JOB_CONCURRENCY))
+        return self._semaphore
+
+    async def submit(self, files: List[UploadFile], knowledge_base_id: str) -> str:
+        """落盘上传文件并创建后台任务，返回任务id"""
+        spooled_files = []
+        try:
+            for file in files:
+                spooled_files.append(await self.pdf_service.spool_pdf(file))
+
+            state = IngestJobState(
+                knowledge_base_id=knowledge_base_id,
+                files=[IngestProgress(file_name=file.filename) for file in files]
+            )
+            job = await create_ingest_job(knowledge_base_id, [p.to_dict() for p in state.files])
+        except Exception:
+            self._cleanup_files(spooled_files)
+            raise
+
+        ingest_calls = [
+            partial(self.pdf_service.ingest_spooled_pdf, spooled, file.filename, knowledge_base_id)
+            for spooled, file in zip(spooled_files, files)
+        ]
+        job_id = self._start(str(job.id), state, self._run(str(job.id), state, ingest_calls, spooled_files))
+        logger.info(f"入库任务已创建：{job_id}，文件数：{len(files)}")
+        return job_id
+
+    async def submit_resume(self, file_id: str) -> str:
+        """创建续传任务，只处理该文件未完成和失败的页面，返回任务id"""
+        pdf_file = await self.pdf_service.get_resumable_file(file_id)
+        # 从创建任务到续传结束都持有该文件的入库租约，排队期间其他进程也不能续传
+        lease = await self.pdf_service.claim_file(file_id)
+        try:
+            state = IngestJobState(
+                knowledge_base_id=pdf_file.knowledge_base_id,
+                files=[IngestProgress(file_name=pdf_file.file_name, file_id=file_id)]
+            )
+            job = await create_ingest_job(pdf_file.knowledge_base_id, [p.to_dict() for p in state.files])
+        except Exception:
+            await lease.release()
+            raise
+
+        job_id = str(job.id)
+
+        async def run():
+            try:
+                await self._run(job_id, state, [partial(self.pdf_service.resume_file, pdf_file)])
+            finally:
+                await lease.release()
+
+        self._start(job_id, state, run())
+        logger.info(f"续传任务已创建：{job_id}，文件：{file_id}")
+        return job_id
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """查询任务进度，运行中的任务返回内存中的实时进度"""
+        state = self._jobs.get(job_id)
+        if state is not None:
+            return summarize_job(job_id, state.knowledge_base_id, state.status, [p.to_dict() for p in state.files])
+
+        job = await select_ingest_job(job_id)
+        if not job:
+            return None
+        return summarize_job(job_id, job.knowledge_base_id, job.status, list(job.files or []))
+
+    async def shutdown(self) -> None:
+        """取消所有未完成的任务（任务状态记为 cancelled）"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _start(self, job_id: str, state: IngestJobState, coro: Awaitable[None]) -> str:
+        self._jobs[job_id] = state
+        task = asyncio.create_task(coro)
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+        return job_id
+
+    async def _run(
+            self,
+            job_id: str,
+            state: IngestJobState,
+            ingest_calls: List[Callable[..., Awaitable[Any]]],
+            spooled_files: List[SpooledFile] = ()
+    ) -> None:
+        """ingest_calls 与 state.files 一一对应，调用时传入 progress"""
+        error = ""
+        flusher = None
+        try:
+            async with self.semaphore:
+                state.status = "running"
+                flusher = asyncio.create_task(self._flush_periodically(job_id, state))
+                file_semaphore = asyncio.Semaphore(max(1, settings.INGEST_JOB_FILE_CONCURRENCY))
+                await asyncio.gather(*[
+                    self._ingest_file(ingest_call, progress, file_semaphore)
+                    for ingest_call, progress in zip(ingest_calls, state.files)
+                ])
+                state.status = self._job_status(state.files)
+        except asyncio.CancelledError:
+            state.status = "cancelled"
+            error = "服务停止，任务中断"
+            raise
+        except Exception as e:
+            logger.error(f"入库任务 {job_id} 失败: {traceback.format_exc()}")
+            state.status = "failed"
+            error = str(e)
+        finally:
+            if flusher:
+                flusher.cancel()
+            self._cleanup_files(spooled_files)
+            await update_ingest_job(job_id, state.status, [p.to_dict() for p in state.files], error)
+            self._jobs.pop(job_id, None)
+            logger.info(f"入库任务结束：{job_id}，状态：{state.status}")
+
+    @staticmethod
+    async def _ingest_file(
+            ingest_call: Callable[..., Awaitable[Any]],
+            progress: IngestProgress,
+            semaphore: asyncio.Semaphore
+    ) -> None:
+        # 等待中的文件保持 pending 状态
+        async with semaphore:
+            progress.status = "running"
+            progress.started_at = time.time()
+            try:
+                await ingest_call(progress=progress)
+                progress.status = "partial" if progress.pages_failed else "success"
+            except Exception as e:
+                progress.status = "failed"
+                progress.error = str(getattr(e, "detail", None) or e)
+            finally:
+                progress.finished_at = time.time()
+
+    async def _flush_periodically(self, job_id: str, state: IngestJobState) -> None:
+        """定期把进度写入 MongoDB，其他进程也能查到任务进度"""
+        while True:
+            await update_ingest_job(job_id, state.status, [p.to_dict() for p in state.files])
+            await asyncio.sleep(max(1, settings.INGEST_JOB_FLUSH_INTERVAL))
+
+    @staticmethod
+    def _job_status(files: List[IngestProgress]) -> str:
+        if all(p.status == "success" for p in files):
+            return "success"
+        if all(p.status == "failed" for p in files):
+            return "failed"
+        return "partial"
+
+    @staticmethod
+    def _cleanup_files(spooled_files: List[SpooledFile]) -> None:
+        for spooled in spooled_files:
+            try:
+                if os.path.exists(spooled.path):
+                    os.remove(spooled.path)
+            except Exception as e:
+                logger.warning(f"删除临时文件失败: {str(e)}")
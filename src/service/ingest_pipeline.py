@@ -0,0 +1,117 @@
+"""
+流式分阶段处理流水线
+
+各阶段之间通过有界队列连接：下游处理不过来时上游阻塞在 put 上（背压），
+每个阶段有独立的并发数，数据逐条/逐批流过，内存占用与总数据量无关
+"""
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Iterable, List, Optional
+
+from loguru import logger
+
+# 阶段结束标记
+_STOP = object()
+
+
+@dataclass
+class PipelineStage:
+    """
+    流水线阶段
+
+    handler 接收一个元素（设置了 batch_size 时接收元素列表），返回传给下一阶段的元素列表；
+    异常需要在 handler 内部处理，未捕获的异常会终止整个流水线。
+    batch_wait 为凑批时拿到第一个元素后最多等待的秒数
+    """
+    name: str
+    handler: Callable[[Any], Awaitable[List[Any]]]
+    concurrency: int = 1
+    batch_size: Optional[int] = None
+    batch_wait: float = 0.0
+
+
+async def _next_batch(queue: asyncio.Queue, batch_size: int, batch_wait: float) -> List[Any]:
+    """阻塞获取第一个元素，再在 batch_wait 时间内凑满一批；遇到结束标记时放回并返回已有元素"""
+    loop = asyncio.get_running_loop()
+    item = await queue.get()
+    if item is _STOP:
+        await queue.put(_STOP)
+        return []
+
+    batch = [item]
+    deadline = loop.time() + batch_wait
+    while len(batch) < batch_size:
+        try:
+            item = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            # 轮询等待而不是 wait_for(queue.get())，避免超时取消时丢失元素
+            await asyncio.sleep(min(remaining, 0.01))
+            continue
+        if item is _STOP:
+            await queue.put(_STOP)
+            break
+        batch.append(item)
+    return batch
+
+
+async def _run_stage(stage: PipelineStage, in_queue: asyncio.Queue, out_queue: asyncio.Queue) -> None:
+    async def worker():
+        while True:
+            if stage.batch_size is not None:
+                batch = await _next_batch(in_queue, max(1, stage.batch_size), stage.batch_wait)
+                if not batch:
+                    return
+                outputs = await stage.handler(batch)
+            else:
+                item = await in_queue.get()
+                if item is _STOP:
+                    # 放回结束标记，让同阶段其他 worker 也能退出
+                    await in_queue.put(_STOP)
+                    return
+                outputs = await stage.handler(item)
+
+            for output in outputs or []:
+                await out_queue.put(output)
+
+    await asyncio.gather(*[worker() for _ in range(max(1, stage.concurrency))])
+    logger.debug(f"pipeline stage {stage.name} finished")
+    await out_queue.put(_STOP)
+
+
+async def _drain(queue: asyncio.Queue) -> None:
+    """消费最后一个阶段的输出"""
+    while await queue.get() is not _STOP:
+        pass
+
+
+async def run_pipeline(items: Iterable[Any], stages: List[PipelineStage], queue_size: int) -> None:
+    """
+    运行流水线直到所有元素流过全部阶段
+
+    Args:
+        items: 第一阶段的输入
+        stages: 按顺序执行的阶段
+        queue_size: 阶段之间队列的最大长度
+    """
+    source = asyncio.Queue()
+    for item in items:
+        source.put_nowait(item)
+    source.put_nowait(_STOP)
+
+    queues = [source] + [asyncio.Queue(maxsize=max(1, queue_size)) for _ in stages]
+    tasks = [
+        asyncio.create_task(_run_stage(stage, queues[i], queues[i + 1]))
+        for i, stage in enumerate(stages)
+    ]
+    tasks.append(asyncio.create_task(_drain(queues[-1])))
+
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
@@ -1,34 +1,36 @@
+import asyncio
 import traceback
 import time
-from typing import List, Any, Dict
+from collections import defaultdict
+from typing import List, Any, Dict, Tuple
 
+import numpy as np
 from loguru import logger
 
 from src.config.config import settings
 from src.db_conn.milvus import get_milvus_client
-from src.schemas.retrieval_schemas import SearchDocumentImagesParams
-from src.service.embed_service import embed_text
+from src.db_conn.milvus_index import get_search_params
+from src.schemas.retrieval_schemas import BatchSearchDocumentImagesParams, SearchDocumentImagesParams
+from src.service.embed_service import embed_queries, embed_query
 
 milvus = get_milvus_client()
 
+OUTPUT_FIELDS = ["image_url", "image_height", "image_width", "file_page", "file_id", "file_name", "page_text"]
 
-async def get_embedding(text) -> List[float]:
+
+async def get_embedding(text) -> np.ndarray:
     try:
-        custom_input = [
-            {"text": text}
-        ]
-        embedding = await embed_text(custom_input=custom_input)
-        return embedding[0].get("embedding")
+        return await embed_query(text)
     except Exception as e:
         logger.error(f"get_embedding: {traceback.format_exc()}")
         raise Exception(f"get embedding error text: {text}")
 
 
 def get_filter_conditions(search_params: SearchDocumentImagesParams):
-    # 构建过滤条件
+    # 构建过滤条件（knowledge_base_id 是分区键，等值过滤时 Milvus 只检索该知识库所在分区）
     _filter = f"knowledge_base_id == '{search_params.knowledge_base_id}'"
     if search_params.file_ids:
-        file_ids_str = ", ".join(str(id) for id in search_params.file_ids)
+        file_ids_str = ", ".join(f"'{id}'" for id in search_params.file_ids)
         _filter += f" and file_id in [{file_ids_str}]"
     return _filter
 
@@ -52,6 +54,7 @@ async def _get_formatted_results(
                 "file_page": hit.get("entity").get("file_page"),
                 "file_id": hit.get("entity").get("file_id"),
                 "file_name": hit.get("entity").get("file_name"),
+                "page_text": hit.get("entity").get("page_text"),
             })
 
     if search_params.min_similarity is not None:
@@ -59,25 +62,91 @@ async def _get_formatted_results(
     return formatted_results
 
 
+async def use_binary_rescore(search_params: SearchDocumentImagesParams) -> bool:
+    """是否使用两阶段检索（集合没有二值向量字段时退回普通检索）"""
+    enabled = settings.SEARCH_BINARY_RESCORE if search_params.binary_rescore is None else search_params.binary_rescore
+    return enabled and await milvus.ahas_binary_vector(settings.MILVUS_DB_COLLECTION_NAME)
+
+
+async def _search(
+        query_vectors: List[np.ndarray],
+        limit: int,
+        _filter: str,
+        binary_rescore: bool = False
+) -> list[list[dict]]:
+    if binary_rescore:
+        return await milvus.abinary_rescore_search(
+            collection_name=settings.MILVUS_DB_COLLECTION_NAME,
+            query_vectors=query_vectors,
+            output_fields=OUTPUT_FIELDS,
+            limit=limit,
+            candidate_limit=limit * settings.SEARCH_BINARY_CANDIDATE_FACTOR,
+            filter=_filter
+        )
+    return await milvus.asearch(
+        collection_name=settings.MILVUS_DB_COLLECTION_NAME,
+        query_vectors=query_vectors,
+        search_params=get_search_params(settings.MILVUS_DB_COLLECTION_NAME),
+        output_fields=OUTPUT_FIELDS,
+        limit=limit,
+        filter=_filter
+    )
+
+
 async def retrieval_image(params: SearchDocumentImagesParams) -> list[dict[str, Any]]:
     start_time = time.time()
     try:
         _filter = get_filter_conditions(params)
 
-        output_fields = ["image_url", "image_height", "image_width", "file_page", "file_id", "file_name"]
-
         query_vectors = await get_embedding(params.query)
-        results = milvus.search(
-            collection_name=settings.MILVUS_DB_COLLECTION_NAME,
-            query_vectors=[query_vectors],
-            search_params=settings.SEARCH_CONFIG,
-            output_fields=output_fields,
-            limit=params.limit,
-            filter=_filter
-        )
+        results = await _search([query_vectors], params.limit, _filter, await use_binary_rescore(params))
         logger.info(f"milvus search image: {time.time() - start_time} seconds")
         return await _get_formatted_results(params, results)
 
     except Exception as e:
         logger.error(f"retrieval_image: {traceback.format_exc()}")
         raise Exception(f"retrieval image error params: {params}")
+
+
+async def retrieval_image_batch(params: BatchSearchDocumentImagesParams) -> List[List[Dict[str, Any]]]:
+    """
+    批量检索：所有问题合并为一次向量化请求，过滤条件相同的问题合并为一次 Milvus 检索，结果与输入顺序一致
+    """
+    queries = params.queries
+    if not queries:
+        return []
+    if len(queries) > settings.SEARCH_BATCH_MAX_QUERIES:
+        raise Exception(f"too many queries: {len(queries)} > {settings.SEARCH_BATCH_MAX_QUERIES}")
+
+    start_time = time.time()
+    try:
+        query_vectors = await embed_queries([query.query for query in queries])
+
+        # 按过滤条件和检索方式分组，每组一次检索（limit 取组内最大值，结果再按各自的 limit 截取）
+        groups: Dict[Tuple[str, bool], List[int]] = defaultdict(list)
+        for i, query in enumerate(queries):
+            groups[(get_filter_conditions(query), await use_binary_rescore(query))].append(i)
+
+        group_results = await asyncio.gather(*(
+            _search(
+                [query_vectors[i] for i in indexes],
+                max(queries[i].limit for i in indexes),
+                _filter,
+                binary_rescore
+            )
+            for (_filter, binary_rescore), indexes in groups.items()
+        ))
+
+        results: List[List[Dict[str, Any]]] = [[] for _ in queries]
+        for indexes, hits_list in zip(groups.values(), group_results):
+            for i, hits in zip(indexes, hits_list):
+                results[i] = await _get_formatted_results(queries[i], [hits[:queries[i].limit]])
+        logger.info(
+            f"milvus batch search image: {len(queries)} queries, {len(groups)} searches, "
+            f"{time.time() - start_time} seconds"
+        )
+        return results
+
+    except Exception as e:
+        logger.error(f"retrieval_image_batch: {traceback.format_exc()}")
+        raise Exception(f"batch retrieval image error, queries: {len(queries)}")
@@ -1,5 +1,4 @@
 # 保存向量数据在milvus
-import traceback
 from typing import Any, List
 
 from loguru import logger
@@ -13,10 +12,23 @@ async def save_kb_milvus(images_data: List[Any]):
             batch_size = 80
             for i in range(0, len(images_data), batch_size):
                 batch = images_data[i:i + batch_size]
-                get_milvus_client().insert(data=batch)
+                await get_milvus_client().ainsert(batch)
         except Exception as e:
             logger.error(f"save_kb_milvus error: {e}")
-            raise traceback.format_exception()
+            raise
 
     logger.info("save_kb_milvus success")
     return True
+
+
+async def delete_file_pages_milvus(file_id: str, pages: List[int]) -> int:
+    """删除文件指定页面的向量（续传前清理未确认写入的页面，避免重复）"""
+    if not pages:
+        return 0
+    try:
+        return await get_milvus_client().adelete(
+            filter=f'file_id == "{file_id}" and file_page in {sorted(pages)}'
+        )
+    except Exception as e:
+        logger.error(f"delete_file_pages_milvus error: {e}")
+        raise
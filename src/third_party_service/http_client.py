@@ -0,0 +1,80 @@
+"""
+进程内共享的异步 HTTP 客户端（连接池 + keep-alive，可选 HTTP/2）
+
+由 FastAPI lifespan 负责创建、预热和关闭；未初始化时（脚本、单独调用）按需创建
+"""
+import asyncio
+from typing import Optional
+
+import httpx
+from loguru import logger
+
+from src.config.config import settings
+
+_http_client: Optional[httpx.AsyncClient] = None
+_http2_enabled = False
+
+
+def _http2_available() -> bool:
+    if not settings.EMBED_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        logger.warning("未安装 h2，HTTP/2 不可用，使用 HTTP/1.1")
+        return False
+
+
+def _create_http_client() -> httpx.AsyncClient:
+    global _http2_enabled
+    _http2_enabled = _http2_available()
+    return httpx.AsyncClient(
+        http2=_http2_enabled,
+        limits=httpx.Limits(
+            max_connections=settings.EMBED_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.EMBED_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.EMBED_HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(
+            settings.EMBED_HTTP_TIMEOUT,
+            connect=settings.EMBED_HTTP_CONNECT_TIMEOUT,
+            pool=settings.EMBED_HTTP_POOL_TIMEOUT,
+        ),
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """获取共享客户端"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = _create_http_client()
+    return _http_client
+
+
+async def _warm_up(client: httpx.AsyncClient) -> None:
+    """预先建立到向量化服务的连接（完成 TCP/TLS 握手），响应状态不重要"""
+    async def ping():
+        try:
+            await client.head(settings.EMBED_SERVER_URL, timeout=settings.EMBED_HTTP_CONNECT_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"HTTP 连接预热失败: {str(e)}")
+
+    # HTTP/2 下多个请求复用同一连接，预热一次即可
+    count = 1 if _http2_enabled else settings.EMBED_HTTP_WARMUP_CONNECTIONS
+    await asyncio.gather(*[ping() for _ in range(count)])
+
+
+async def init_http_client() -> None:
+    client = get_http_client()
+    if settings.EMBED_HTTP_WARMUP_CONNECTIONS > 0:
+        await _warm_up(client)
+    logger.info("HTTP client initialized")
+
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+    logger.info("HTTP client closed")
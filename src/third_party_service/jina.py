@@ -1,9 +1,80 @@
 import asyncio
 from typing import Optional
+
+import numpy as np
 from loguru import logger
 import httpx
+import orjson
 
 from src.config.config import settings
+from src.third_party_service.http_client import get_http_client
+from src.third_party_service.resilience import (
+    CircuitBreaker,
+    ResilientCaller,
+    RetryPolicy,
+    ServiceCallError,
+    TokenBucket
+)
+from src.utils.vector import as_vector, decode_base64_vector
+
+
+class EmbeddingError(Exception):
+    """获取嵌入向量失败"""
+
+
+def _is_retryable(e: Exception) -> bool:
+    """超时、网络错误、429 和 5xx 可以重试"""
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code == 429 or e.response.status_code >= 500
+    return isinstance(e, httpx.TransportError)
+
+
+def _decode_embedding(value) -> np.ndarray:
+    """base64 格式返回字符串，float 格式返回数组"""
+    if isinstance(value, str):
+        return decode_base64_vector(value)
+    return as_vector(value)
+
+
+def _retry_after(e: Exception) -> Optional[float]:
+    """读取 429/503 响应中的 Retry-After（秒）"""
+    if isinstance(e, httpx.HTTPStatusError):
+        try:
+            return float(e.response.headers.get("Retry-After"))
+        except (TypeError, ValueError):
+            return None
+    return None
+
+
+_embedding_caller: Optional[ResilientCaller] = None
+
+
+def get_embedding_caller() -> ResilientCaller:
+    """向量化服务调用策略（进程内共享熔断和限流状态）"""
+    global _embedding_caller
+    if _embedding_caller is None:
+        _embedding_caller = ResilientCaller(
+            name="embedding",
+            retry=RetryPolicy(
+                max_attempts=settings.EMBED_RETRY_MAX_ATTEMPTS,
+                base_delay=settings.EMBED_RETRY_BASE_DELAY,
+                max_delay=settings.EMBED_RETRY_MAX_DELAY,
+                deadline=settings.EMBED_REQUEST_DEADLINE,
+            ),
+            breaker=CircuitBreaker(
+                "embedding",
+                failure_threshold=settings.EMBED_CIRCUIT_FAILURE_THRESHOLD,
+                reset_timeout=settings.EMBED_CIRCUIT_RESET_TIMEOUT,
+            ),
+            limiter=TokenBucket(
+                settings.EMBED_RATE_LIMIT_RPS, settings.EMBED_RATE_LIMIT_BURST
+            ) if settings.EMBED_RATE_LIMIT_RPS > 0 else None,
+            hedge=settings.EMBED_HEDGE_ENABLED,
+            hedge_delay=settings.EMBED_HEDGE_DELAY_MS / 1000,
+            is_retryable=_is_retryable,
+            retry_after=_retry_after,
+        )
+    return _embedding_caller
 
 
 async def get_embeddings_async(custom_input: Optional[list] = None):
@@ -13,18 +84,18 @@ async def get_embeddings_async(custom_input: Optional[list] = None):
         custom_input: 包含文本或图像的输入列表，每个元素应包含'text'或'image'字段
 
     Returns:
-        包含嵌入向量的字典列表，每个字典包含'index'、'image_or_text'和'embedding'字段
-        发生错误时返回None
+        包含嵌入向量的字典列表（与输入顺序一致），每个字典包含'index'、'image_or_text'和'embedding'（float32 数组）字段
+
+    Raises:
+        EmbeddingError: 输入不正确，或重试耗尽、超过截止时间、熔断等原因未能获取向量
     """
     if not custom_input:
-        logger.error("输入数据为空")
-        return None
+        raise EmbeddingError("输入数据为空")
 
     # 验证输入格式
     for item in custom_input:
         if not isinstance(item, dict) or ("text" not in item and "image" not in item):
-            logger.error("输入数据格式不正确，每个元素必须是包含'text'或'image'的字典")
-            return None
+            raise EmbeddingError("输入数据格式不正确，每个元素必须是包含'text'或'image'的字典")
 
     headers = {
         "Content-Type": "application/json",
@@ -33,45 +104,50 @@ async def get_embeddings_async(custom_input: Optional[list] = None):
 
     # 构建请求数据
     request_data = {
-        "model": "jina-embeddings-v4",
-        "task": "text-matching",
+        "model": settings.EMBED_MODEL_NAME,
+        "task": settings.EMBED_TASK,
+        "embedding_type": settings.EMBED_RESPONSE_ENCODING,
+        "dimensions": settings.EMBED_DIMENSION,
         "input": custom_input
     }
-
-
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                settings.EMBED_SERVER_URL,
-                headers=headers,
-                json=request_data,
-                timeout=30.0  # 从配置中读取
-            )
-
-            response.raise_for_status()
-            response_data = response.json().get("data", [])
-
-            # 构建结果
-            results = []
-            for item, embedding_data in zip(custom_input, response_data):
-                results.append({
-                    'index': item.get("text"),
-                    "image_or_text": item.get("image") or item.get("text"),
-                    'embedding': embedding_data.get("embedding"),
-                })
-
-            return results
-
-        except httpx.HTTPStatusError as e:
-            logger.error(f"HTTP错误: {e.response.status_code}")
-            logger.error(f"错误信息: {e.response.text}")
-            return None
-        except httpx.RequestError as e:
-            logger.error(f"请求错误: {str(e)}")
-            return None
-        except Exception as e:
-            logger.error(f"未知错误: {str(e)}")
-            return None
+    # 请求体只序列化一次，重试和对冲请求复用
+    content = orjson.dumps(request_data)
+
+    async def request():
+        # 使用共享客户端，复用连接池中的连接
+        response = await get_http_client().post(
+            settings.EMBED_SERVER_URL,
+            headers=headers,
+            content=content
+        )
+        if response.is_error:
+            logger.error(f"HTTP错误: {response.status_code}，错误信息: {response.text}")
+        response.raise_for_status()
+        return orjson.loads(response.content).get("data", [])
+
+    try:
+        response_data = await get_embedding_caller().call(request)
+    except ServiceCallError as e:
+        logger.error(f"获取向量失败: {str(e)}")
+        raise EmbeddingError(str(e)) from e
+
+    if len(response_data) != len(custom_input):
+        raise EmbeddingError(f"向量数量与输入不一致: {len(response_data)} != {len(custom_input)}")
+
+    # 构建结果，按返回的 index 对应回输入顺序
+    response_data = sorted(
+        enumerate(response_data),
+        key=lambda x: x[1].get("index", x[0])
+    )
+    results = []
+    for item, (i, embedding_data) in zip(custom_input, response_data):
+        results.append({
+            'index': embedding_data.get("index", i),
+            "image_or_text": item.get("image") or item.get("text"),
+            'embedding': _decode_embedding(embedding_data.get("embedding")),
+        })
+
+    return results
 
 
 # 使用示例
@@ -0,0 +1,245 @@
+"""
+第三方服务调用策略：有界重试（指数退避 + 随机抖动）、对冲请求、令牌桶限流、熔断
+"""
+import asyncio
+import random
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Deque, Optional, TypeVar
+
+from loguru import logger
+
+T = TypeVar("T")
+
+
+class ServiceCallError(Exception):
+    """第三方服务调用失败（重试耗尽、超过截止时间或不可重试的错误）"""
+
+
+class CircuitOpenError(ServiceCallError):
+    """熔断器打开，请求被直接拒绝"""
+
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 3  # 最大尝试次数（含首次）
+    base_delay: float = 0.2  # 首次重试的退避时间上限（秒）
+    max_delay: float = 5.0  # 单次退避时间上限（秒）
+    deadline: float = 60.0  # 单次调用（含所有重试）的总时间上限（秒）
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """第 attempt 次失败后的等待时间：指数退避 + 全量随机抖动，服务端给出 Retry-After 时取较大值"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+
+class TokenBucket:
+    """令牌桶限流，rate 为每秒补充的令牌数，capacity 为桶容量（允许的突发请求数）"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> bool:
+        """有令牌时取走一个并返回 True，不等待"""
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    async def acquire(self) -> None:
+        """等待直到取得一个令牌"""
+        while not self.try_acquire():
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class CircuitBreaker:
+    """
+    熔断器
+
+    连续失败 failure_threshold 次后打开，打开期间直接拒绝请求；
+    reset_timeout 秒后进入半开状态，只放行一个试探请求，成功则关闭，失败则重新打开
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self.state = "half_open"
+            self._trial_in_flight = False
+        # 半开状态只放行一个试探请求
+        if self._trial_in_flight:
+            return False
+        self._trial_in_flight = True
+        return True
+
+    def release_trial(self) -> None:
+        """试探请求被取消时释放名额"""
+        self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        if self.state != "closed":
+            logger.info(f"circuit {self.name} closed")
+        self.state = "closed"
+        self._failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self.state == "half_open" or self._failures >= self.failure_threshold:
+            if self.state != "open":
+                logger.warning(f"circuit {self.name} opened after {self._failures} failures")
+            self.state = "open"
+            self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class LatencyTracker:
+    """记录最近的成功请求耗时，用于计算对冲请求的触发延迟"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, latency: float) -> None:
+        self._samples.append(latency)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+class ResilientCaller:
+    """
+    按策略调用第三方服务
+
+    fn 每次调用发起一次请求，失败时抛出异常；is_retryable 判断异常是否可以重试（如超时、429、5xx），
+    retry_after 从异常中读取服务端建议的等待时间。对冲请求要求请求是幂等的
+    """
+
+    def __init__(
+            self,
+            name: str,
+            retry: RetryPolicy,
+            breaker: Optional[CircuitBreaker] = None,
+            limiter: Optional[TokenBucket] = None,
+            hedge: bool = False,
+            hedge_delay: float = 1.0,
+            is_retryable: Callable[[Exception], bool] = lambda e: True,
+            retry_after: Callable[[Exception], Optional[float]] = lambda e: None,
+    ):
+        self.name = name
+        self.retry = retry
+        self.breaker = breaker
+        self.limiter = limiter
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.is_retryable = is_retryable
+        self.retry_after = retry_after
+        self.latency = LatencyTracker()
+
+    async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.retry.deadline
+        last_error: Optional[Exception] = None
+
+        for attempt in range(max(1, self.retry.max_attempts)):
+            if self.breaker is not None and not self.breaker.allow():
+                raise CircuitOpenError(f"{self.name} circuit is open") from last_error
+
+            try:
+                remaining = deadline - loop.time()
+                if self.limiter is not None:
+                    await asyncio.wait_for(self.limiter.acquire(), remaining)
+                result = await asyncio.wait_for(self._hedged(fn), deadline - loop.time())
+            except asyncio.CancelledError:
+                if self.breaker is not None:
+                    self.breaker.release_trial()
+                raise
+            except asyncio.TimeoutError as e:
+                last_error = e
+                if self.breaker is not None:
+                    self.breaker.record_failure()
+                break
+            except Exception as e:
+                last_error = e
+                if not self.is_retryable(e):
+                    # 请求本身有误（如 4xx），不计入熔断
+                    if self.breaker is not None:
+                        self.breaker.record_success()
+                    raise ServiceCallError(f"{self.name} request failed: {str(e)}") from e
+                if self.breaker is not None:
+                    self.breaker.record_failure()
+                delay = self.retry.backoff(attempt, self.retry_after(e))
+                if attempt + 1 >= self.retry.max_attempts or loop.time() + delay >= deadline:
+                    break
+                logger.warning(f"{self.name} attempt {attempt + 1} failed, retry in {delay:.2f}s: {str(e)}")
+                await asyncio.sleep(delay)
+            else:
+                if self.breaker is not None:
+                    self.breaker.record_success()
+                return result
+
+        raise ServiceCallError(f"{self.name} request failed: {str(last_error) or type(last_error).__name__}") \
+            from last_error
+
+    def _current_hedge_delay(self) -> float:
+        """对冲延迟：样本足够时取最近请求耗时的 p95，否则使用配置值"""
+        return self.latency.percentile(0.95) or self.hedge_delay
+
+    async def _timed(self, fn: Callable[[], Awaitable[T]]) -> T:
+        start = time.monotonic()
+        result = await fn()
+        self.latency.record(time.monotonic() - start)
+        return result
+
+    async def _hedged(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """请求超过对冲延迟仍未返回时再发一次相同请求，取先成功的结果"""
+        if not self.hedge:
+            return await self._timed(fn)
+
+        first = asyncio.ensure_future(self._timed(fn))
+        pending = {first}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=self._current_hedge_delay())
+            # 没有令牌时不发对冲请求，避免超出服务商配额
+            if done or (self.limiter is not None and not self.limiter.try_acquire()):
+                return await first
+
+            logger.debug(f"{self.name} hedged request sent")
+            pending.add(asyncio.ensure_future(self._timed(fn)))
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
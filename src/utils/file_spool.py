@@ -0,0 +1,74 @@
+"""
+上传文件分块落盘
+"""
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import BinaryIO, Optional
+
+from src.config.config import settings
+
+
+class UploadTooLargeError(Exception):
+    """上传文件超过大小限制"""
+
+
+@dataclass
+class SpooledFile:
+    """已落盘的上传文件"""
+    path: str  # 临时文件路径
+    size: int  # 文件大小（字节）
+    digest: Optional[str] = None  # 文件摘要（十六进制），未计算时为 None
+
+
+def spool_to_temp_file(
+        src: BinaryIO,
+        suffix: str = "",
+        chunk_size: int = settings.UPLOAD_CHUNK_SIZE,
+        hash_algorithm: Optional[str] = settings.UPLOAD_HASH_ALGORITHM,
+        max_size: int = settings.UPLOAD_MAX_SIZE,
+        dir: Optional[str] = None,
+) -> SpooledFile:
+    """
+    按固定大小分块把文件流复制到临时文件，内存占用只与分块大小有关
+
+    Args:
+        src: 源文件流
+        suffix: 临时文件后缀
+        chunk_size: 分块大小（字节）
+        hash_algorithm: 复制过程中顺带计算的摘要算法（hashlib 名称），为空则不计算
+        max_size: 文件大小上限（字节），0 表示不限制
+        dir: 临时文件目录，默认使用系统临时目录
+
+    Returns:
+        SpooledFile
+
+    Raises:
+        UploadTooLargeError: 超过大小限制（已写入的临时文件会被删除）
+    """
+    hasher = hashlib.new(hash_algorithm) if hash_algorithm else None
+    size = 0
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix, dir=dir) as tmp:
+        try:
+            while True:
+                chunk = src.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_size and size > max_size:
+                    raise UploadTooLargeError(f"文件大小超过限制 {max_size} 字节")
+                if hasher:
+                    hasher.update(chunk)
+                tmp.write(chunk)
+        except BaseException:
+            tmp.close()
+            os.remove(tmp.name)
+            raise
+
+    return SpooledFile(
+        path=tmp.name,
+        size=size,
+        digest=hasher.hexdigest() if hasher else None,
+    )
@@ -75,7 +75,7 @@ class FileUploaderFactory:
         cls._uploaders[name] = uploader_class
 
 
-def zhipu_image_upload(image_data: bytes) -> Optional[Dict[str, Any]]:
+def zhipu_image_upload(image_data: bytes, file_type: str = 'jpg') -> Optional[Dict[str, Any]]:
     # 创建智谱上传器实例
     uploader = FileUploaderFactory.create_uploader('zhipu')
 
@@ -83,7 +83,7 @@ def zhipu_image_upload(image_data: bytes) -> Optional[Dict[str, Any]]:
         # 上传文件（不指定文件名，将使用临时文件名）
         result = uploader.upload(
             file_content=image_data,
-            file_type='jpg'  # 文件类型/扩展名
+            file_type=file_type  # 文件类型/扩展名
         )
         return result
     except Exception as e:
@@ -0,0 +1,63 @@
+"""
+本地 CPU 向量模型（在进程池中运行）
+
+依赖 sentence-transformers（可选依赖，只在使用本地模型时需要），每个子进程只加载一次模型
+"""
+import base64
+import io
+from typing import Dict, List
+
+import numpy as np
+import requests
+from PIL import Image
+
+_models = {}
+
+
+def _load_model(model_name: str):
+    model = _models.get(model_name)
+    if model is None:
+        from sentence_transformers import SentenceTransformer
+        model = _models[model_name] = SentenceTransformer(model_name, device="cpu")
+    return model
+
+
+def _load_image(value: str) -> Image.Image:
+    """图片输入可以是图片地址或 base64 数据"""
+    if value.startswith(("http://", "https://")):
+        response = requests.get(value, timeout=30)
+        response.raise_for_status()
+        data = response.content
+    else:
+        data = base64.b64decode(value)
+    return Image.open(io.BytesIO(data)).convert("RGB")
+
+
+def model_dimension(model_name: str) -> int:
+    """模型输出的向量维度（同时预加载模型）"""
+    model = _load_model(model_name)
+    # CLIP 等多模态模型不一定声明维度，按实际输出计算
+    return model.get_sentence_embedding_dimension() or len(model.encode("dimension"))
+
+
+def encode_inputs(model_name: str, custom_input: List[Dict[str, str]]) -> List[np.ndarray]:
+    """
+    计算一批输入的向量（进程池任务入口），返回结果与输入顺序一致
+
+    文本和图片分别批量编码，向量做 L2 归一化
+    """
+    model = _load_model(model_name)
+    embeddings: List = [None] * len(custom_input)
+
+    text_indexes = [i for i, item in enumerate(custom_input) if "text" in item]
+    image_indexes = [i for i, item in enumerate(custom_input) if "text" not in item]
+    if text_indexes:
+        vectors = model.encode([custom_input[i]["text"] for i in text_indexes], normalize_embeddings=True)
+        for i, vector in zip(text_indexes, vectors):
+            embeddings[i] = vector.astype(np.float32, copy=False)
+    if image_indexes:
+        images = [_load_image(custom_input[i]["image"]) for i in image_indexes]
+        vectors = model.encode(images, normalize_embeddings=True)
+        for i, vector in zip(image_indexes, vectors):
+            embeddings[i] = vector.astype(np.float32, copy=False)
+    return embeddings
@@ -0,0 +1,139 @@
+"""
+页面图片编码
+
+编码器只依赖 PyMuPDF 和 PIL，编码参数 EncodeOptions 可序列化，可直接传给渲染子进程
+"""
+import io
+import math
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, asdict, fields
+from typing import Any, Dict, Optional
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+# 图片格式 -> 上传时使用的文件扩展名
+IMAGE_EXTENSIONS = {
+    "jpeg": "jpg",
+    "png": "png",
+    "webp": "webp",
+}
+
+
+@dataclass(frozen=True)
+class EncodeOptions:
+    """页面渲染与编码参数"""
+    format: str = "jpeg"  # 图片格式 jpeg/png/webp
+    engine: str = "pil"  # 编码引擎 pil/pymupdf
+    dpi: int = 160  # 渲染分辨率
+    quality: int = 95  # JPEG/WebP 质量（1-100）
+    chroma_subsampling: int = 2  # JPEG 色度抽样：0 为 4:4:4，1 为 4:2:2，2 为 4:2:0（仅 pil 引擎生效）
+    max_pixels: int = 0  # 单页最大像素数，超过时按比例降低分辨率，0 表示不限制
+
+    @property
+    def extension(self) -> str:
+        return IMAGE_EXTENSIONS[self.format]
+
+    def key(self) -> str:
+        """参数标识，参数相同时同一页面的编码结果相同"""
+        return ",".join(f"{name}={value}" for name, value in asdict(self).items())
+
+    def merge(self, overrides: Optional[Dict[str, Any]]) -> "EncodeOptions":
+        """使用知识库配置覆盖默认参数，忽略未知字段和空值"""
+        names = {f.name for f in fields(self)}
+        values = {k: v for k, v in (overrides or {}).items() if k in names and v is not None}
+        options = EncodeOptions(**{**asdict(self), **values})
+        options.validate()
+        return options
+
+    def validate(self) -> None:
+        if self.format not in IMAGE_EXTENSIONS:
+            raise ValueError(f"Unknown image format: {self.format}")
+        if self.engine not in PageEncoderFactory.engines():
+            raise ValueError(f"Unknown image encoder: {self.engine}")
+        if not 1 <= self.quality <= 100:
+            raise ValueError("Image quality must be between 1 and 100")
+        if self.chroma_subsampling not in (0, 1, 2):
+            raise ValueError("Chroma subsampling must be 0, 1 or 2")
+
+
+class PageEncoder(ABC):
+    """页面图片编码器抽象基类"""
+
+    formats = ()  # 支持的图片格式
+
+    @abstractmethod
+    def encode(self, pix: fitz.Pixmap, options: EncodeOptions) -> bytes:
+        """把渲染结果编码为图片字节"""
+        pass
+
+
+class PyMuPDFEncoder(PageEncoder):
+    """使用 PyMuPDF 原生编码，不经过 PIL 复制像素数据"""
+
+    formats = ("jpeg", "png")
+
+    def encode(self, pix: fitz.Pixmap, options: EncodeOptions) -> bytes:
+        if options.format == "jpeg":
+            return pix.tobytes("jpeg", jpg_quality=options.quality)
+        return pix.tobytes("png")
+
+
+class PILEncoder(PageEncoder):
+    """使用 PIL 编码，支持 WebP 和 JPEG 色度抽样设置"""
+
+    formats = ("jpeg", "png", "webp")
+
+    def encode(self, pix: fitz.Pixmap, options: EncodeOptions) -> bytes:
+        # 直接引用 Pixmap 的像素内存，不额外复制
+        image = Image.frombuffer("RGB", (pix.width, pix.height), pix.samples_mv, "raw", "RGB", pix.stride, 1)
+        output = io.BytesIO()
+        if options.format == "jpeg":
+            image.save(output, format="JPEG", quality=options.quality, subsampling=options.chroma_subsampling)
+        elif options.format == "webp":
+            image.save(output, format="WEBP", quality=options.quality)
+        else:
+            image.save(output, format="PNG")
+        return output.getvalue()
+
+
+class PageEncoderFactory:
+    """页面图片编码器工厂类"""
+
+    _encoders = {
+        'pil': PILEncoder,
+        'pymupdf': PyMuPDFEncoder,
+    }
+
+    @classmethod
+    def create_encoder(cls, options: EncodeOptions) -> PageEncoder:
+        """按编码参数创建编码器，所选引擎不支持该格式时使用 PIL"""
+        if options.engine not in cls._encoders:
+            raise ValueError(f"Unknown image encoder: {options.engine}")
+
+        encoder_class = cls._encoders[options.engine]
+        if options.format not in encoder_class.formats:
+            encoder_class = PILEncoder
+        return encoder_class()
+
+    @classmethod
+    def register_encoder(cls, name: str, encoder_class: type):
+        """注册新的编码器类型"""
+        if not issubclass(encoder_class, PageEncoder):
+            raise TypeError("Encoder class must be a subclass of PageEncoder")
+        cls._encoders[name] = encoder_class
+
+    @classmethod
+    def engines(cls):
+        return cls._encoders.keys()
+
+
+def page_zoom(page: fitz.Page, options: EncodeOptions) -> float:
+    """计算渲染缩放比例，超过像素上限时按比例缩小"""
+    zoom = options.dpi / 72
+    if options.max_pixels:
+        rect = page.rect
+        pixels = rect.width * rect.height * zoom * zoom
+        if pixels > options.max_pixels:
+            zoom *= math.sqrt(options.max_pixels / pixels)
+    return zoom
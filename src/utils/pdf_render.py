@@ -0,0 +1,180 @@
+"""
+PDF页面渲染
+
+本模块只依赖 PyMuPDF 和 PIL，可在线程池或子进程中直接使用（子进程只需导入本模块）
+"""
+import hashlib
+import mmap
+import os
+import traceback
+from dataclasses import dataclass
+from typing import Dict, Any, List, Literal, Optional, Tuple, get_args
+
+import fitz  # PyMuPDF
+
+from src.utils.page_encoder import EncodeOptions, PageEncoderFactory, page_zoom
+
+
+# 文本层策略：image 全部渲染图片 / text 有文本层的页面只写入文本 / text_and_figures 写入文本，含图片的页面同时渲染图片
+TextPolicy = Literal["image", "text", "text_and_figures"]
+TEXT_POLICIES = get_args(TextPolicy)
+
+
+@dataclass(frozen=True)
+class TextOptions:
+    """文本层提取参数"""
+    policy: TextPolicy = "image"
+    min_chars: int = 200  # 有效字符数（不含空白）不少于该值才视为可用文本层
+    max_chars: int = 8000  # 写入的最大字符数，超出部分截断
+
+    def key(self) -> str:
+        return f"text_policy={self.policy},text_min_chars={self.min_chars},text_max_chars={self.max_chars}"
+
+
+def extract_page_text(page: fitz.Page, options: TextOptions) -> Optional[str]:
+    """提取页面文本层，文本不足（扫描件、以图片为主的页面）时返回 None"""
+    text = page.get_text("text", sort=True).strip()
+    if len("".join(text.split())) < max(1, options.min_chars):
+        return None
+    return text[:options.max_chars]
+
+
+def page_has_figures(page: fitz.Page) -> bool:
+    """页面是否包含位图"""
+    return bool(page.get_images())
+
+
+def open_pdf(pdf_path: str) -> fitz.Document:
+    """
+    通过内存映射打开PDF
+
+    MuPDF 直接读取映射内存（零拷贝），多个线程/进程打开同一文件时共享操作系统页缓存。
+    返回的文档需要使用 close_pdf 关闭，以便同时释放内存映射
+    """
+    with open(pdf_path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    try:
+        doc = fitz.open(stream=view, filetype="pdf")
+    except Exception:
+        view.release()
+        mapped.close()
+        raise
+    doc._mapped_buffer = (view, mapped)
+    return doc
+
+
+def close_pdf(doc: fitz.Document) -> None:
+    """关闭文档并释放内存映射"""
+    if not doc.is_closed:
+        doc.close()
+    view, mapped = getattr(doc, "_mapped_buffer", (None, None))
+    if view is not None:
+        view.release()
+        mapped.close()
+        doc._mapped_buffer = (None, None)
+
+
+def render_page(doc: fitz.Document, page_num: int, options: EncodeOptions) -> Tuple[bytes, int, int]:
+    """
+    渲染单个页面并按编码参数编码
+
+    Args:
+        doc: 已打开的PDF文档
+        page_num: 页码（从1开始）
+        options: 渲染与编码参数
+
+    Returns:
+        (图片字节, 宽度, 高度)
+    """
+    page = doc.load_page(page_num - 1)
+
+    # 计算缩放比例（受像素上限约束）
+    zoom = page_zoom(page, options)
+    mat = fitz.Matrix(zoom, zoom)
+
+    # 直接渲染为Pixmap，避免中间转换
+    pix = page.get_pixmap(matrix=mat, alpha=False)
+
+    encoder = PageEncoderFactory.create_encoder(options)
+    return encoder.encode(pix, options), pix.width, pix.height
+
+
+def render_document_pages(
+        doc: fitz.Document,
+        page_nums: List[int],
+        options: EncodeOptions,
+        text_options: TextOptions = TextOptions()
+) -> List[Dict[str, Any]]:
+    """
+    使用已打开的文档渲染一批页面
+
+    单页失败不会影响同批次其他页面，失败信息通过 error 字段返回
+
+    Returns:
+        图片结果包含 page/image/width/height/hash（图片 sha256），
+        文本结果包含 page/text/width/height（按渲染参数计算的页面尺寸），失败时包含 page/error；
+        text_and_figures 策略下同一页可能同时返回文本和图片结果
+    """
+    results = []
+    for page_num in page_nums:
+        try:
+            if text_options.policy != "image":
+                page = doc.load_page(page_num - 1)
+                text = extract_page_text(page, text_options)
+                if text is not None:
+                    zoom = page_zoom(page, options)
+                    results.append({
+                        "page": page_num,
+                        "text": text,
+                        "width": round(page.rect.width * zoom),
+                        "height": round(page.rect.height * zoom),
+                    })
+                    if text_options.policy == "text" or not page_has_figures(page):
+                        continue
+
+            img_bytes, width, height = render_page(doc, page_num, options)
+            results.append({
+                "page": page_num,
+                "image": img_bytes,
+                "width": width,
+                "height": height,
+                "hash": hashlib.sha256(img_bytes).hexdigest(),
+            })
+        except Exception as e:
+            results.append({
+                "page": page_num,
+                "error": f"{str(e)} {traceback.format_exc()}",
+            })
+    return results
+
+
+def render_pdf_pages(
+        pdf_path: str,
+        page_nums: List[int],
+        options: EncodeOptions,
+        text_options: TextOptions = TextOptions()
+) -> List[Dict[str, Any]]:
+    """渲染一批页面（进程池任务入口），同一文件的后续批次复用本进程已打开的文档"""
+    return render_document_pages(_get_process_document(pdf_path), page_nums, options, text_options)
+
+
+# 进程池工作进程缓存最近使用的文档：(路径, inode, 大小, 修改时间) -> 文档
+# 工作进程一次只执行一个任务，不会并发使用同一文档；临时文件名可能被复用，所以键中包含文件标识
+_process_document: Optional[Tuple[Tuple, fitz.Document]] = None
+
+
+def _get_process_document(pdf_path: str) -> fitz.Document:
+    global _process_document
+    stat = os.stat(pdf_path)
+    key = (pdf_path, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    if _process_document is not None and _process_document[0] == key:
+        return _process_document[1]
+
+    # 切换文件时关闭上一个文档
+    if _process_document is not None:
+        close_pdf(_process_document[1])
+        _process_document = None
+    doc = open_pdf(pdf_path)
+    _process_document = (key, doc)
+    return doc
@@ -0,0 +1,72 @@
+"""
+向量工具：统一使用连续内存的 float32 NumPy 数组表示向量
+"""
+import base64
+from typing import Any
+
+import numpy as np
+
+VECTOR_DTYPE = np.float32
+
+
+def as_vector(value: Any) -> np.ndarray:
+    """把列表、数组或 float32 字节转换为一维 float32 向量（已是 float32 连续数组时不复制）"""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return np.frombuffer(value, dtype=VECTOR_DTYPE)
+    return np.ascontiguousarray(value, dtype=VECTOR_DTYPE).reshape(-1)
+
+
+def decode_base64_vector(value: str) -> np.ndarray:
+    """解码 base64 编码的 float32（小端）向量"""
+    return np.frombuffer(base64.b64decode(value), dtype="<f4").astype(VECTOR_DTYPE, copy=False)
+
+
+def l2_normalize(vector: np.ndarray) -> np.ndarray:
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+def _bfloat16_dtype():
+    try:
+        import ml_dtypes
+    except ImportError as e:
+        raise ImportError("BFLOAT16 vectors require the ml_dtypes package") from e
+    return ml_dtypes.bfloat16
+
+
+def check_storage_type(storage_type: str) -> None:
+    """检查当前环境能否转换该存储精度（bfloat16 需要 ml_dtypes），在启动时调用，避免入库时才报错"""
+    if storage_type == "bfloat16":
+        _bfloat16_dtype()
+
+
+def to_storage_vector(vector: Any, storage_type: str) -> np.ndarray:
+    """把向量转换为集合的存储精度（float32 / float16 / bfloat16）"""
+    vector = as_vector(vector)
+    if storage_type == "float16":
+        return vector.astype(np.float16)
+    if storage_type == "bfloat16":
+        return vector.astype(_bfloat16_dtype())
+    return vector
+
+
+def from_storage_vector(value: Any, storage_type: str) -> np.ndarray:
+    """把查询返回的向量（半精度时为字节）转换为 float32"""
+    if isinstance(value, (bytes, bytearray)) and storage_type in ("float16", "bfloat16"):
+        dtype = np.float16 if storage_type == "float16" else _bfloat16_dtype()
+        return np.frombuffer(value, dtype=dtype).astype(VECTOR_DTYPE)
+    if isinstance(value, list) and len(value) == 1 and isinstance(value[0], (bytes, bytearray)):
+        return from_storage_vector(value[0], storage_type)
+    return as_vector(value)
+
+
+def binary_quantize(vector: Any) -> bytes:
+    """符号量化：每一维大于 0 记为 1，按位打包（BINARY_VECTOR 字段，维度需为 8 的倍数）"""
+    return np.packbits(as_vector(vector) > 0).tobytes()
+
+
+def truncate_vector(vector: np.ndarray, dimension: int) -> np.ndarray:
+    """截取前 dimension 维并重新归一化（Matryoshka 向量的前缀仍是有效向量）"""
+    if len(vector) <= dimension:
+        return vector
+    return l2_normalize(vector[:dimension])